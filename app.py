@@ -9,30 +9,68 @@ Quick Start:
 3. Seed data: python seed_data.py
 4. Create admin: flask --app app create-admin
 5. Run: python run.py or flask --app app run
+6. Production: gunicorn --preload -w 4 wsgi:application
 """
 from __future__ import annotations
 
 import os
 import getpass
-from flask import Flask
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider, JSONProvider
 from flask_login import LoginManager
-from werkzeug.security import generate_password_hash
+from flask_sqlalchemy.record_queries import get_recorded_queries
 
 from config import Config
-from models import User, db
+from extensions import cache, limiter
+from models import User, db, upgrade_schema
 
 # Import Blueprints
 from routes.auth import auth_bp
 from routes.core import core_bp
 from routes.onboarding import onboarding_bp
 from routes.api import api_bp
+from services.auth_service import hash_password
+from services.notification_service import check_notifications_engine
+from services.streak_service import recompute_all_streaks
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson; dates serialize as ISO 8601 strings."""
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    @staticmethod
+    def _default(o: Any) -> Any:
+        if isinstance(o, Decimal):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self._default, option=self.option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self._default, option=self.option),
+            mimetype="application/json",
+        )
+
 
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = OrjsonProvider(app)
     
     # Initialize Extensions
     db.init_app(app)
+    cache.init_app(app)
+    limiter.init_app(app)
 
     login_manager = LoginManager()
     login_manager.login_view = "auth.login" # Updated to blueprint view
@@ -40,7 +78,14 @@ def create_app() -> Flask:
 
     @login_manager.user_loader
     def load_user(user_id: str) -> User | None:
-        return User.query.get(int(user_id))
+        return db.session.get(User, int(user_id))
+
+    if app.config["SQLALCHEMY_RECORD_QUERIES"]:
+        @app.after_request
+        def log_query_count(response):
+            """Surface N+1 regressions while developing."""
+            app.logger.info("[queries] %s %s: %d", request.method, request.path, len(get_recorded_queries()))
+            return response
 
     # Register Blueprints
     app.register_blueprint(auth_bp)
@@ -54,6 +99,7 @@ def create_app() -> Flask:
         """Initialize the database."""
         with app.app_context():
             db.create_all()
+            upgrade_schema()
         print("Database initialized.")
 
     @app.cli.command("create-admin")
@@ -63,19 +109,34 @@ def create_app() -> Flask:
         email = input("Email: ")
         password = getpass.getpass("Password: ")
         with app.app_context():
-            if User.query.filter_by(email=email).first():
+            if db.session.query(db.exists().where(User.email == email)).scalar():
                 print("User already exists.")
                 return
             admin = User(
                 fullname=name,
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=hash_password(password),
                 is_admin=True,
             )
             db.session.add(admin)
             db.session.commit()
             print("Admin created.")
 
+    @app.cli.command("send-notifications")
+    def send_notifications_command():
+        """Run the notification engine for every user (schedule via cron)."""
+        with app.app_context():
+            for user in User.query.all():
+                check_notifications_engine(user)
+        print("Notifications checked.")
+
+    @app.cli.command("refresh-streaks")
+    def refresh_streaks_command():
+        """Recompute stored streaks for every user (schedule nightly via cron)."""
+        with app.app_context():
+            recompute_all_streaks()
+        print("Streaks refreshed.")
+
     return app
 
 
@@ -1,6 +1,13 @@
 """Configuration settings for the GymSphere Flask application."""
 import os
 
+import orjson
+
+
+def _orjson_dumps(value) -> str:
+    # Like json.dumps, accept int dict keys
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
 
 class Config:
     """Base configuration."""
@@ -9,6 +16,19 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "change-me-in-prod")
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "gym.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "connect_args": {"check_same_thread": False, "timeout": 30},
+        "pool_size": 10,
+        "pool_pre_ping": True,
+        # db.JSON columns (badge criteria, notification payloads, plan metadata)
+        "json_serializer": _orjson_dumps,
+        "json_deserializer": orjson.loads,
+    }
+    # Set to 1 to print the SQL query count of every request
+    SQLALCHEMY_RECORD_QUERIES = os.getenv("SQLALCHEMY_RECORD_QUERIES") == "1"
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "SimpleCache")
+    CACHE_DEFAULT_TIMEOUT = 300
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
 
 
 
@@ -1,10 +1,8 @@
-from app import create_app
+from app import app
 from models import User, UserPlan, DailyPlanEntry, db
 from services.streak_service import calculate_streaks
 from datetime import datetime
 
-app = create_app()
-
 with app.app_context():
     # Get the user (assuming ID 1 for single user dev env, or the logged in user)
     # We'll print all users to be sure
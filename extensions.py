@@ -0,0 +1,17 @@
+"""Flask extension instances shared across blueprints."""
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from flask_login import current_user
+
+cache = Cache()
+
+
+def _rate_limit_key() -> str:
+    """Limit signed-in users individually, anonymous clients by address."""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return get_remote_address()
+
+
+limiter = Limiter(key_func=_rate_limit_key)
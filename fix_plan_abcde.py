@@ -1,9 +1,7 @@
-from app import create_app
+from app import app
 from models import User, UserPlan, DailyPlanEntry, db
 from services.plan_service import generate_month_plan
 
-app = create_app()
-
 with app.app_context():
     user = User.query.get(3) # 'abcde'
     if not user:
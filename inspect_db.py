@@ -1,7 +1,12 @@
-from app import create_app
+from flask import Flask
+
+from config import Config
 from models import db, User, Exercise, Product
 
-app = create_app()
+# Only the database is needed here, so skip the full app factory
+app = Flask(__name__)
+app.config.from_object(Config)
+db.init_app(app)
 with app.app_context():
     try:
         user_count = User.query.count()
@@ -1,13 +1,114 @@
 """Database models for the GymSphere application."""
+import sqlite3
 from datetime import datetime
 
+import orjson
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm.attributes import get_history
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.types import TypeDecorator
 
 db = SQLAlchemy()
 
 
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers proceed during writes; NORMAL sync is safe under WAL."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.close()
+
+
+class PreEncodedJSON(TypeDecorator):
+    """
+    JSON stored as TEXT, encoded with orjson. A str value is taken as
+    already-encoded JSON and stored verbatim, so a payload shared by many
+    rows can be serialized once.
+    """
+
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else orjson.loads(value)
+
+
+def upgrade_schema() -> None:
+    """
+    Bring a database created by an older db.create_all() up to date.
+    create_all() skips tables that already exist, so add any columns and
+    indexes declared since, plus the data fixes those changes need.
+    Must run inside an app context.
+    """
+    existing = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        present = {c["name"] for c in existing.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+    # Water logs used to be one row per glass; fold them into the
+    # single per-day row the unique index expects.
+    db.session.execute(db.text(
+        "UPDATE water_logs SET amount_ml = ("
+        " SELECT SUM(w.amount_ml) FROM water_logs w"
+        " WHERE w.user_id = water_logs.user_id AND w.date = water_logs.date)"
+    ))
+    db.session.execute(db.text(
+        "DELETE FROM water_logs WHERE id NOT IN ("
+        " SELECT MIN(id) FROM water_logs GROUP BY user_id, date)"
+    ))
+    db.session.execute(db.text(
+        "UPDATE user_plans SET"
+        " exercise_done_count = (SELECT COUNT(*) FROM daily_plan_entries e"
+        "  WHERE e.plan_id = user_plans.id AND e.is_exercise_completed = 1),"
+        " diet_done_count = (SELECT COUNT(*) FROM daily_plan_entries e"
+        "  WHERE e.plan_id = user_plans.id AND e.is_diet_completed = 1)"
+    ))
+    db.session.execute(db.text(
+        "DELETE FROM user_badges WHERE id NOT IN ("
+        " SELECT MIN(id) FROM user_badges GROUP BY user_id, badge_id)"
+    ))
+    # Tags are bucketed in memory by the workout catalog; drop the unused
+    # exercise_tags mirror earlier schemas created.
+    db.session.execute(db.text("DROP TABLE IF EXISTS exercise_tags"))
+    # Point users created before active_plan_id at their latest plan.
+    db.session.execute(db.text(
+        "UPDATE users SET active_plan_id = ("
+        " SELECT p.id FROM user_plans p WHERE p.user_id = users.id"
+        " ORDER BY p.created_at DESC LIMIT 1)"
+        " WHERE active_plan_id IS NULL"
+    ))
+    # Superseded by idx_plan_streak_flags, which also covers is_exercise_day
+    db.session.execute(db.text("DROP INDEX IF EXISTS idx_plan_date_completion"))
+    # Served the per-title unread probe the engine's prefetch replaced;
+    # unread scans use idx_notif_user_read_created
+    db.session.execute(db.text("DROP INDEX IF EXISTS idx_notif_unread"))
+    db.session.commit()
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    # Refresh planner statistics so new (e.g. partial) indexes get picked
+    with db.engine.begin() as conn:
+        conn.execute(db.text("ANALYZE"))
+
+
 class User(UserMixin, db.Model):
     """Application user."""
 
@@ -40,23 +141,31 @@ class User(UserMixin, db.Model):
 
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Most recently generated plan; set by generate_month_plan
+    active_plan_id = db.Column(db.Integer, ForeignKey("user_plans.id", use_alter=True))
+
     progress_logs = db.relationship(
         "UserProgress",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="dynamic",
+        lazy="select",
     )
     notifications = db.relationship(
         "Notification",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="dynamic",
+        lazy="select",
     )
     orders = db.relationship(
         "Order",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="dynamic",
+        lazy="select",
+    )
+
+    __table_args__ = (
+        # Admins are a handful of rows; index only those
+        db.Index("idx_users_admin", "id", sqlite_where=db.text("is_admin = 1")),
     )
 
     def __repr__(self) -> str:
@@ -105,6 +214,10 @@ class Product(db.Model):
     rating = db.Column(db.Float, default=4.5)
     src = db.Column(db.String(50), default="local") # local, amazon, flipkart
 
+    __table_args__ = (
+        db.Index("idx_product_name", "name", unique=True),
+    )
+
     def __repr__(self) -> str:
         return f"<Product {self.name}>"
 
@@ -128,6 +241,10 @@ class Exercise(db.Model):
     
     tags = db.Column(db.String(200)) # Comma-separated tags
 
+    __table_args__ = (
+        db.Index("idx_exercise_name", "name", unique=True),
+    )
+
     def __repr__(self) -> str:
         return f"<Exercise {self.name}>"
 
@@ -143,6 +260,11 @@ class WaterLog(db.Model):
     
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # One row per user per day; logging upserts into it
+        db.Index("idx_water_user_date", "user_id", "date", unique=True),
+    )
+
 class SleepLog(db.Model):
     """Track nightly sleep."""
     __tablename__ = "sleep_logs"
@@ -153,6 +275,10 @@ class SleepLog(db.Model):
     hours = db.Column(db.Float, default=0.0)
     quality = db.Column(db.String(20)) # Good, Average, Poor
 
+    __table_args__ = (
+        db.Index("idx_sleep_user_date", "user_id", "date"),
+    )
+
 class Badge(db.Model):
     """Gamification badges."""
     __tablename__ = "badges"
@@ -175,6 +301,11 @@ class UserBadge(db.Model):
     badge = db.relationship("Badge")
     user = db.relationship("User", backref="badges")
 
+    __table_args__ = (
+        # A badge is earned once; awards can INSERT ... ON CONFLICT DO NOTHING
+        db.Index("idx_user_badge", "user_id", "badge_id", unique=True),
+    )
+
 
 class UserProgress(db.Model):
     """Weight/progress log per user."""
@@ -188,6 +319,10 @@ class UserProgress(db.Model):
 
     user = db.relationship("User", back_populates="progress_logs")
 
+    __table_args__ = (
+        db.Index("idx_progress_user_logged", "user_id", "logged_at"),
+    )
+
     def __repr__(self) -> str:
         return f"<UserProgress user={self.user_id} at {self.logged_at}>"
 
@@ -212,6 +347,12 @@ class Notification(db.Model):
 
     user = db.relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        db.Index("idx_notif_user_read_created", "user_id", "is_read", "created_at"),
+        # Per-user delivery scan: scheduled_for <= now
+        db.Index("idx_notif_user_scheduled", "user_id", "scheduled_for"),
+    )
+
     def __repr__(self) -> str:
         return f"<Notification {self.title}>"
 
@@ -250,11 +391,25 @@ class UserPlan(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     metadata_json = db.Column(db.JSON)  # For summary, break days list, etc.
 
+    # Workout streak snapshot, refreshed by calculate_streaks
+    current_streak = db.Column(db.Integer, default=0, server_default="0")
+    longest_streak = db.Column(db.Integer, default=0, server_default="0")
+    # Day the streak columns were last recomputed (check-in, dashboard or cron)
+    streaks_refreshed_on = db.Column(db.Date)
+    # Completed-day counters, kept in step by _sync_plan_done_counts
+    exercise_done_count = db.Column(db.Integer, default=0, server_default="0")
+    diet_done_count = db.Column(db.Integer, default=0, server_default="0")
+
     daily_entries = db.relationship(
         "DailyPlanEntry",
         back_populates="plan",
         cascade="all, delete-orphan",
-        lazy="dynamic",
+        lazy="select",
+        order_by="DailyPlanEntry.date",
+    )
+
+    __table_args__ = (
+        db.Index("idx_plan_user_end_created", "user_id", "end_date", "created_at"),
     )
 
     def __repr__(self) -> str:
@@ -270,8 +425,8 @@ class DailyPlanEntry(db.Model):
     plan_id = db.Column(db.Integer, ForeignKey("user_plans.id"), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     is_exercise_day = db.Column(db.Boolean, default=False)
-    exercise_payload = db.Column(db.JSON)  # List of exercises
-    diet_payload = db.Column(db.JSON)  # Macros, meals
+    exercise_payload = db.Column(PreEncodedJSON)  # List of exercises
+    diet_payload = db.Column(PreEncodedJSON)  # Macros, meals
     
     # Completion status
     is_exercise_completed = db.Column(db.Boolean, default=False)
@@ -292,12 +447,41 @@ class DailyPlanEntry(db.Model):
 
     __table_args__ = (
         db.Index("idx_plan_date", "plan_id", "date"),
+        # Covers streak/completion scans (every flag they read) without
+        # touching the table rows
+        db.Index(
+            "idx_plan_streak_flags",
+            "plan_id", "date", "is_exercise_day", "is_exercise_completed", "is_diet_completed",
+        ),
+        db.Index("idx_plan_streak_group", "plan_id", "streak_group"),
     )
 
     def __repr__(self) -> str:
         return f"<DailyPlanEntry {self.date} plan={self.plan_id}>"
 
 
+_DONE_COUNTERS = {
+    "is_exercise_completed": "exercise_done_count",
+    "is_diet_completed": "diet_done_count",
+}
+
+
+@event.listens_for(DailyPlanEntry, "after_update")
+def _sync_plan_done_counts(mapper, connection, target):
+    """Recount the parent plan's completed days when a completion flag flips."""
+    plans = UserPlan.__table__
+    entries = DailyPlanEntry.__table__
+    values = {
+        counter: db.select(db.func.count())
+        .where(entries.c.plan_id == target.plan_id, entries.c[flag].is_(True))
+        .scalar_subquery()
+        for flag, counter in _DONE_COUNTERS.items()
+        if get_history(target, flag).has_changes()
+    }
+    if values:
+        connection.execute(plans.update().where(plans.c.id == target.plan_id).values(**values))
+
+
 class UserCheckIn(db.Model):
     """Log of user check-ins."""
 
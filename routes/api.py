@@ -1,12 +1,15 @@
 from datetime import datetime
-from flask import Blueprint, jsonify, request
+import orjson
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_login import current_user, login_required
 from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import cache, limiter
 from models import UserPlan, DailyPlanEntry, UserCheckIn, Notification, WaterLog, SleepLog, User, UserProgress, db
-from services.plan_service import generate_month_plan
-from services.streak_service import compute_streaks
+from services.plan_service import generate_month_plan, get_active_plan
+from services.streak_service import compute_streaks, streaks_are_fresh
 from services.notification_service import schedule_tomorrow_plan_notification 
-from services.diet_service import recommend_shopping
+from services.diet_service import product_cache_version, recommend_shopping
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -30,12 +33,9 @@ def api_plan_today():
     today = datetime.utcnow().date()
     
     # Find active plan (end date >= today)
-    plan = UserPlan.query.filter(
-        UserPlan.user_id == current_user.id,
-        UserPlan.end_date >= today
-    ).order_by(UserPlan.created_at.desc()).first()
+    plan = get_active_plan(current_user)
     
-    if not plan:
+    if not plan or plan.end_date < today:
         return jsonify({"status": "no_plan"})
         
     entry = DailyPlanEntry.query.filter_by(plan_id=plan.id, date=today).first()
@@ -46,7 +46,7 @@ def api_plan_today():
         "status": "ok",
         "entry": {
             "id": entry.id,
-            "date": entry.date.isoformat(),
+            "date": entry.date,
             "is_exercise_day": entry.is_exercise_day,
             "is_exercise_completed": entry.is_exercise_completed,
             "is_diet_completed": entry.is_diet_completed,
@@ -75,33 +75,42 @@ def api_plan_checkin():
     entry_id = data.get("entry_id")
     checkin_type = data.get("type") # exercise, diet
     
-    entry = DailyPlanEntry.query.get_or_404(entry_id)
-    if entry.plan.user_id != current_user.id:
-        return jsonify({"error": "Unauthorized"}), 403
+    u = current_user._get_current_object()
+    # Ownership is checked in the same SELECT, so entry.plan is never loaded
+    entry = (
+        DailyPlanEntry.query.join(UserPlan)
+        .filter(DailyPlanEntry.id == entry_id, UserPlan.user_id == u.id)
+        .first()
+    )
+    if entry is None:
+        return jsonify({"error": "Entry not found"}), 404
         
     # Update status and last check-in date
+    now = datetime.utcnow()
     if checkin_type == "exercise":
         entry.is_exercise_completed = True
-        entry.exercise_completed_at = datetime.utcnow()
-        current_user.last_workout_date = datetime.utcnow().date()
+        entry.exercise_completed_at = now
+        u.last_workout_date = now.date()
     elif checkin_type == "diet":
         entry.is_diet_completed = True
-        entry.diet_completed_at = datetime.utcnow()
-        current_user.last_diet_date = datetime.utcnow().date()
+        entry.diet_completed_at = now
+        u.last_diet_date = now.date()
         
     # Log check-in
     checkin = UserCheckIn(
-        user_id=current_user.id,
+        user_id=u.id,
         daily_entry_id=entry.id,
         type=checkin_type,
         note=data.get("note")
     )
     db.session.add(checkin)
-    db.session.commit()
     
-    # Trigger updates
-    schedule_tomorrow_plan_notification(current_user)
-    streaks = compute_streaks(current_user.id, entry.plan_id)
+    # Trigger updates. Streaks read the flags set above (autoflush); both
+    # only stage their writes, so one commit saves the check-in, streaks
+    # and any notification together.
+    schedule_tomorrow_plan_notification(u)
+    streaks = compute_streaks(u.id, entry.plan_id)
+    db.session.commit()
     
     return jsonify({
         "status": "ok",
@@ -113,65 +122,87 @@ def api_plan_checkin():
 def api_plan_calendar():
     # Get active plan
     today = datetime.utcnow().date()
-    plan = UserPlan.query.filter(
-        UserPlan.user_id == current_user.id
-    ).order_by(UserPlan.created_at.desc()).first()
+    plan = get_active_plan(current_user)
     
     if not plan:
-            return jsonify([])
+            return Response(b"", mimetype="application/x-ndjson")
             
-    entries = DailyPlanEntry.query.filter_by(plan_id=plan.id).all()
-    
-    result = []
-    for e in entries:
-        # Determine status color/state for frontend
-        status = "future"
-        if e.date < today:
-            if (e.is_exercise_day and e.is_exercise_completed and e.is_diet_completed) or \
-                (not e.is_exercise_day and e.is_diet_completed):
-                status = "completed"
+    # Only the columns the calendar needs; rows come back as plain tuples
+    entries = DailyPlanEntry.query.with_entities(
+        DailyPlanEntry.date,
+        DailyPlanEntry.is_exercise_day,
+        DailyPlanEntry.is_exercise_completed,
+        DailyPlanEntry.is_diet_completed,
+    ).filter_by(plan_id=plan.id).yield_per(200)
+    
+    def generate():
+        # One JSON object per line, written as rows come off the cursor
+        for day, is_exercise_day, exercise_done, diet_done in entries:
+            # Determine status color/state for frontend
+            completed = bool(diet_done) and (not is_exercise_day or bool(exercise_done))
+            if day < today:
+                status = "completed" if completed else "missed"
+            elif day == today:
+                status = "completed" if completed else "today"
             else:
-                status = "missed"
-        elif e.date == today:
-             if (e.is_exercise_day and e.is_exercise_completed and e.is_diet_completed) or \
-                (not e.is_exercise_day and e.is_diet_completed):
-                 status = "completed"
-             else:
-                 status = "today"
-        
-        result.append({
-            "date": e.date.isoformat(),
-            "is_exercise_day": e.is_exercise_day,
-            "is_exercise_completed": e.is_exercise_completed,
-            "is_diet_completed": e.is_diet_completed,
-            "status": status
-        })
+                status = "future"
+            
+            yield orjson.dumps({
+                "date": day,
+                "is_exercise_day": is_exercise_day,
+                "is_exercise_completed": exercise_done,
+                "is_diet_completed": diet_done,
+                "status": status
+            }) + b"\n"
         
-    return jsonify(result)
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 @api_bp.route("/plan/stats")
 @login_required
 def api_plan_stats():
     today = datetime.utcnow().date()
-    plan = UserPlan.query.filter(
-        UserPlan.user_id == current_user.id,
-        UserPlan.end_date >= today
-    ).order_by(UserPlan.created_at.desc()).first()
+    # Streaks are stored on the plan at check-in time; read them back
+    # instead of rescanning the plan's entries, refreshing at most once a
+    # day so a missed day still breaks them for clients polling this alone.
+    u = current_user._get_current_object()
+    plan = get_active_plan(u)
     
-    if not plan:
-        return jsonify({"current_streak": 0, "longest_streak": 0})
+    if not plan or plan.end_date < today:
+        return jsonify({"workout": 0, "diet": 0, "current_streak": 0, "longest_streak": 0,
+                        "exercise_days_done": 0, "diet_days_done": 0})
+    
+    if not streaks_are_fresh(plan):
+        compute_streaks(u.id, plan.id)
+        db.session.commit()
         
-    streaks = compute_streaks(current_user.id, plan.id)
-    return jsonify(streaks)
+    return jsonify({
+        "workout": u.workout_streak or 0,
+        "diet": u.diet_streak or 0,
+        "current_streak": plan.current_streak or 0,
+        "longest_streak": plan.longest_streak or 0,
+        "exercise_days_done": plan.exercise_done_count or 0,
+        "diet_days_done": plan.diet_done_count or 0,
+    })
 
 @api_bp.route("/notifications")
 @login_required
 def api_notifications():
     # Unread first, then recent read
-    notifs = Notification.query.filter_by(user_id=current_user.id).order_by(
-        Notification.is_read.asc(),
-        Notification.created_at.desc()
-    ).limit(20).all()
+    # Core select of the feed columns; rows are tuples, not ORM instances
+    notifs = db.session.execute(
+        db.select(
+            Notification.id,
+            Notification.title,
+            Notification.message,
+            Notification.type,
+            Notification.is_read,
+            Notification.created_at,
+            Notification.payload_json,
+        )
+        .where(Notification.user_id == current_user.id)
+        .order_by(Notification.is_read.asc(), Notification.created_at.desc())
+        .limit(20)
+    ).all()
     
     return jsonify([{
         "id": n.id,
@@ -203,24 +234,38 @@ def api_notifications_read():
 
 @api_bp.route("/shop/recommend")
 @login_required
+@cache.cached(key_prefix=lambda: f"shop:{current_user.goal}:{product_cache_version()}")
 def api_shop_recommend():
     items = recommend_shopping(current_user.goal, current_app)
     return jsonify(items)
 
 @api_bp.route("/water/log", methods=["POST"])
 @login_required
+@limiter.limit("30/minute")
 def api_water_log():
     data = request.get_json(silent=True) or {}
     amount = data.get("amount", 250)
     
-    log = WaterLog(user_id=current_user.id, amount_ml=amount, date=datetime.utcnow().date())
-    db.session.add(log)
+    # Accumulate into the user's row for today instead of adding a row per glass
+    now = datetime.utcnow()
+    stmt = sqlite_insert(WaterLog).values(
+        user_id=current_user.id, date=now.date(), amount_ml=amount, updated_at=now
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WaterLog.user_id, WaterLog.date],
+        set_={
+            "amount_ml": WaterLog.amount_ml + stmt.excluded.amount_ml,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.session.execute(stmt)
     db.session.commit()
     
     return jsonify({"status": "ok", "added": amount})
 
 @api_bp.route("/sleep/log", methods=["POST"])
 @login_required
+@limiter.limit("30/minute")
 def api_sleep_log():
     data = request.get_json(silent=True) or {}
     hours = data.get("hours", 8)
@@ -235,11 +280,17 @@ def api_sleep_log():
 @login_required
 def api_leaderboard():
     # Mock leaderboard
-    top_users = db.session.query(
-        User.fullname, db.func.count(UserProgress.id).label('score')
-    ).join(UserProgress).group_by(User.id).order_by(db.desc('score')).limit(5).all()
+    # Plain (name, score) tuples aggregated in SQL - no User rows are hydrated
+    top_users = (
+        User.query.with_entities(User.fullname, db.func.count(UserProgress.id).label('score'))
+        .join(UserProgress)
+        .group_by(User.id)
+        .order_by(db.desc('score'))
+        .limit(5)
+        .all()
+    )
     
-    leaderboard = [{"name": u.fullname, "score": u.score, "metric": "Check-ins"} for u in top_users]
+    leaderboard = [{"name": name, "score": score, "metric": "Check-ins"} for name, score in top_users]
     
     if not leaderboard:
         leaderboard = [{"name": "Admin User", "score": 42, "metric": "Workouts"}, {"name": "Bot One", "score": 30, "metric": "Workouts"}]
@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_user, logout_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import User, db
+from services.auth_service import hash_password, verify_password
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -9,13 +9,13 @@ auth_bp = Blueprint('auth', __name__)
 def register():
     if request.method == "POST":
         email = request.form.get("email").strip().lower()
-        if User.query.filter_by(email=email).first():
+        if db.session.query(db.exists().where(User.email == email)).scalar():
             flash("Email already registered", "warning")
             return redirect(url_for("auth.register"))
         user = User(
             fullname=request.form.get("fullname"),
             email=email,
-            password_hash=generate_password_hash(request.form.get("password")),
+            password_hash=hash_password(request.form.get("password")),
         )
         db.session.add(user)
         db.session.commit()
@@ -29,7 +29,8 @@ def login():
         email = request.form.get("email").strip().lower()
         password = request.form.get("password")
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user, password):
+            db.session.commit()  # Persist a rehash of legacy password hashes
             login_user(user)
             return redirect(url_for("core.dashboard"))
         flash("Invalid credentials", "danger")
@@ -1,11 +1,13 @@
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, session, jsonify, request, flash
+from flask import Blueprint, current_app, render_template, redirect, url_for, session, jsonify, request, flash
 from flask_login import current_user, login_required
-from models import UserProgress, WaterLog, SleepLog, Product, UserPlan, DailyPlanEntry, db
+from sqlalchemy.orm import raiseload, selectinload
+from models import UserProgress, WaterLog, SleepLog, Product, DailyPlanEntry, UserBadge, DietPlan, Exercise, db
 from services.workout_service import recommend_workout, get_equipment_for_workout
 from services.diet_service import recommend_diet, generate_weekly_mealplan
-from services.notification_service import check_notifications_engine
-from services.streak_service import compute_streaks
+from services.notification_service import queue_notifications_check
+from services.plan_service import get_active_plan
+from services.streak_service import compute_streaks, streaks_are_fresh
 
 core_bp = Blueprint('core', __name__)
 
@@ -39,9 +41,13 @@ def dashboard():
     chart_labels = []
     chart_values = []
     
+    # Bind the user and its profile fields once; each current_user.x goes
+    # through the LocalProxy and the ORM attribute descriptor.
+    u = current_user._get_current_object()
+    goal, fitness_level, freq = u.goal, u.fitness_level, u.freq_per_week
     today = datetime.utcnow().date()
     # 0. Fetch Active Plan Entry for Today
-    active_plan = UserPlan.query.filter_by(user_id=current_user.id).order_by(UserPlan.created_at.desc()).first()
+    active_plan = get_active_plan(u)
     today_entry = None
     if active_plan:
             today_entry = DailyPlanEntry.query.filter_by(plan_id=active_plan.id, date=today).first()
@@ -52,7 +58,7 @@ def dashboard():
             if today_entry.is_exercise_day:
                 ex_list = today_entry.exercise_payload or []
                 workout = {
-                    "frequency": current_user.freq_per_week,
+                    "frequency": freq,
                     "exercises": ex_list[:3] if ex_list else [],
                     "total_exercises": len(ex_list),
                     "duration_min": "45"
@@ -62,7 +68,7 @@ def dashboard():
             else:
                 # Rest Day
                 workout = {
-                    "frequency": current_user.freq_per_week,
+                    "frequency": freq,
                     "exercises": [],
                     "total_exercises": 0,
                     "duration_min": 0,
@@ -71,7 +77,7 @@ def dashboard():
                 full_workout = {"exercises": []}
         else:
             # Fallback
-            full_workout = recommend_workout(current_user.goal, current_user.fitness_level, current_user.freq_per_week or 3)
+            full_workout = recommend_workout(goal, fitness_level, freq or 3)
             workout = {
                 "frequency": full_workout.get("frequency"),
                 "exercises": full_workout.get("exercises", [])[:3], 
@@ -80,26 +86,28 @@ def dashboard():
             }
 
         # 2. Today's Diet Target
-        diet = recommend_diet(current_user.weight_kg, current_user.target_weight_kg, current_user.goal)
+        diet = recommend_diet(u.weight_kg, u.target_weight_kg, goal)
         
         # 3. Gamification & Streaks (Needed for Dashboard Summary)
-        check_notifications_engine(current_user)
+        # Notifications are fetched by the client separately, so generate
+        # them in the background rather than blocking the page render.
+        queue_notifications_check(current_app._get_current_object(), u.id)
         
-        # Force recalculate streak to ensure it's up to date (especially after fixes)
-        # We need the plan_id.
-        latest_plan = UserPlan.query.filter_by(user_id=current_user.id).order_by(UserPlan.created_at.desc()).first()
-        if latest_plan:
-             compute_streaks(current_user.id, latest_plan.id)
+        # Streaks only change on check-in (which recomputes them) or when the
+        # day rolls over, so recompute at most once a day from here.
+        if active_plan and not streaks_are_fresh(active_plan):
+             compute_streaks(u.id, active_plan.id)
+             db.session.commit()
         
         # Refresh user instance to get updated values
-        db.session.refresh(current_user)
+        db.session.refresh(u)
         
-        workout_streak = current_user.workout_streak
-        diet_streak = current_user.diet_streak
+        workout_streak = u.workout_streak
+        diet_streak = u.diet_streak
         
         # 4. Chart Data (Last 7 entries)
         progress_logs = (
-            UserProgress.query.filter_by(user_id=current_user.id)
+            UserProgress.query.filter_by(user_id=u.id)
             .order_by(UserProgress.logged_at.desc())
             .limit(7)
             .all()
@@ -116,15 +124,15 @@ def dashboard():
             workout = {"frequency": 3, "exercises": [], "total_exercises": 0, "duration_min": 0}
         if not diet:
             diet = {"calories": 0, "macros": {"protein_g": 0, "carbs_g": 0, "fats_g": 0}}
-        workout_streak = current_user.workout_streak or 0
-        diet_streak = current_user.diet_streak or 0
+        workout_streak = u.workout_streak or 0
+        diet_streak = u.diet_streak or 0
         # chart_labels/values already defaulted above
 
     return render_template(
         "dashboard.html",
         workout=workout,
         diet=diet,
-        user=current_user,
+        user=u,
         workout_streak=workout_streak,
         diet_streak=diet_streak,
         chart_labels=chart_labels,
@@ -134,7 +142,8 @@ def dashboard():
 @core_bp.route("/workout")
 @login_required
 def workout_page():
-    workout = recommend_workout(current_user.goal, current_user.fitness_level, current_user.freq_per_week or 3)
+    u = current_user._get_current_object()
+    workout = recommend_workout(u.goal, u.fitness_level, u.freq_per_week or 3)
     equipment = get_equipment_for_workout(workout.get("exercises", []))
     return render_template("workout.html", workout=workout, equipment=equipment)
 
@@ -146,16 +155,18 @@ def shop_page():
 @core_bp.route("/diet")
 @login_required
 def diet_page():
-    diet = recommend_diet(current_user.weight_kg, current_user.target_weight_kg, current_user.goal)
-    mealplan = generate_weekly_mealplan(diet or {}, current_user.goal)
+    u = current_user._get_current_object()
+    diet = recommend_diet(u.weight_kg, u.target_weight_kg, u.goal)
+    mealplan = generate_weekly_mealplan(diet or {}, u.goal)
     return render_template("diet.html", diet=diet, mealplan=mealplan)
 
 @core_bp.route("/progress")
 @login_required
 def progress_page():
+    user_id = current_user.id
     # Fetch detailed progress data
     progress_logs = (
-        UserProgress.query.filter_by(user_id=current_user.id)
+        UserProgress.query.filter_by(user_id=user_id)
         .order_by(UserProgress.logged_at.asc())
         .all()
     )
@@ -164,25 +175,21 @@ def progress_page():
     
     # 2. Lifestyle Data (Moved from Dashboard)
     today_date = datetime.utcnow().date()
-    water_logs = WaterLog.query.filter(
-        WaterLog.user_id == current_user.id,
+    hydration_current = db.session.query(WaterLog.amount_ml).filter(
+        WaterLog.user_id == user_id,
         WaterLog.date == today_date
-    ).all()
-    hydration_current = sum(log.amount_ml for log in water_logs)
+    ).scalar() or 0
     hydration_goal = 3000 
     
     sleep_log = SleepLog.query.filter(
-        SleepLog.user_id == current_user.id,
+        SleepLog.user_id == user_id,
         SleepLog.date == today_date
     ).first()
     sleep_data = {"hours": sleep_log.hours if sleep_log else 0, "quality": sleep_log.quality if sleep_log else "-"}
 
     # 3. Calendar Check-In History
-    from models import UserPlan, DailyPlanEntry
-    active_plan = UserPlan.query.filter_by(user_id=current_user.id).order_by(UserPlan.created_at.desc()).first()
-    calendar_entries = []
-    if active_plan:
-        calendar_entries = DailyPlanEntry.query.filter_by(plan_id=active_plan.id).order_by(DailyPlanEntry.date.asc()).all()
+    active_plan = get_active_plan(current_user)
+    calendar_entries = active_plan.daily_entries if active_plan else []
     
     return render_template(
         "progress.html", 
@@ -197,7 +204,13 @@ def progress_page():
 @core_bp.route("/account")
 @login_required
 def account_page():
-    user_badges = [ub.badge for ub in current_user.badges]
+    # Load badges in one extra SELECT instead of one per UserBadge row
+    earned = (
+        UserBadge.query.options(selectinload(UserBadge.badge), raiseload("*"))
+        .filter_by(user_id=current_user.id)
+        .all()
+    )
+    user_badges = [ub.badge for ub in earned]
     return render_template("account.html", user=current_user, badges=user_badges)
 
 @core_bp.route("/update_progress", methods=["POST"])
@@ -216,7 +229,6 @@ def admin():
     if not current_user.is_admin:
         flash("Admin access required", "warning")
         return redirect(url_for("core.dashboard"))
-    from models import DietPlan, Exercise
     exercises = Exercise.query.all()
     diet_plans = DietPlan.query.all()
     products = Product.query.all()
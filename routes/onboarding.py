@@ -2,6 +2,7 @@ from typing import Dict, Any
 from flask import Blueprint, render_template, redirect, url_for, request, jsonify
 from flask_login import current_user, login_required
 from models import db
+from services.plan_service import generate_month_plan
 
 onboarding_bp = Blueprint('onboarding', __name__)
 
@@ -40,8 +41,6 @@ def activity():
         return redirect(url_for("onboarding.fitness_level"))
     return render_template("activity.html")
 
-from services.plan_service import generate_month_plan
-
 @onboarding_bp.route("/fitness-level", methods=["GET", "POST"])
 def fitness_level():
     if request.method == "POST" and current_user.is_authenticated:
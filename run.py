@@ -1,7 +1,7 @@
 """Run script for GymSphere Flask application."""
-from app import create_app
-
-app = create_app()
+# app.py builds the application at import time; reuse it instead of
+# constructing a second instance.
+from app import app
 
 if __name__ == "__main__":
     import os
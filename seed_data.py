@@ -2,10 +2,16 @@
 from datetime import datetime, timedelta
 
 from flask import Flask
-from werkzeug.security import generate_password_hash
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import raiseload
 
-from app import create_app
-from models import DietPlan, Exercise, Product, User, UserProgress, Notification, db
+from app import app as application
+from models import Badge, DietPlan, Exercise, Product, User, UserPlan, UserProgress, Notification, db
+from services.auth_service import hash_password
+from services.plan_service import generate_month_plan
+from services.diet_service import clear_product_cache
+from services.workout_service import clear_exercise_cache
 
 
 def seed_exercises():
@@ -68,22 +74,29 @@ def seed_exercises():
         {"name": "Chest Stretch", "tags": "stretch,cooldown", "muscle_group": "Chest", "equipment": "Bodyweight", "difficulty": "Beginner"},
     ]
     
-    for ex in exercises:
-        if not Exercise.query.filter_by(name=ex["name"]).first():
-            new_ex = Exercise(
-                name=ex["name"],
-                muscle_group=ex["muscle_group"],
-                difficulty=ex["difficulty"],
-                equipment=ex["equipment"],
-                description=f"Perform {ex['name']} with proper form.",
-                tags=ex["tags"],
-                animation_type="lottie",
-                animation_url="https://assets.lottiefiles.com/packages/lf20_9xRkZk.json", # Placeholder
-                thumbnail_url=f"https://placehold.co/400x300?text={ex['name'].replace(' ', '+')}"
-            )
-            db.session.add(new_ex)
+    # Same for every exercise
+    shared = {
+        "animation_type": "lottie",
+        "animation_url": "https://assets.lottiefiles.com/packages/lf20_9xRkZk.json", # Placeholder
+    }
+    
+    # One executemany INSERT; names already present are skipped by the unique index
+    rows = [
+        dict(
+            shared,
+            name=ex["name"],
+            muscle_group=ex["muscle_group"],
+            difficulty=ex["difficulty"],
+            equipment=ex["equipment"],
+            description=f"Perform {ex['name']} with proper form.",
+            tags=ex["tags"],
+            thumbnail_url=f"https://placehold.co/400x300?text={ex['name'].replace(' ', '+')}"
+        )
+        for ex in exercises
+    ]
+    db.session.execute(sqlite_insert(Exercise).on_conflict_do_nothing(index_elements=["name"]), rows)
+    clear_exercise_cache()
     
-    db.session.commit()
     print("[SUCCESS] Comprehensive exercise library seeded.")
 
 
@@ -117,9 +130,10 @@ def seed_diet_plans():
             "description": "Maintenance calories with balanced macros.",
         },
     ]
-    for plan in plans:
-        if not DietPlan.query.filter_by(name=plan["name"]).first():
-            db.session.add(DietPlan(**plan))
+    existing = {name for (name,) in db.session.query(DietPlan.name)}
+    rows = [plan for plan in plans if plan["name"] not in existing]
+    if rows:
+        db.session.execute(insert(DietPlan), rows)
 
 
 def seed_products():
@@ -136,34 +150,37 @@ def seed_products():
         {"name": "Pull-up Bar", "price": 25.00, "category": "equipment", "equipment_type": "Pull-up Bar", "description": "Doorway mount bar.", "image_url": "https://m.media-amazon.com/images/I/61-vA0mR-KL._AC_SX679_.jpg", "affiliate_url": "#"},
     ]
     
-    for p in products:
-        existing = Product.query.filter_by(name=p["name"]).first()
-        if existing:
-            # Update existing product
-            existing.image_url = p["image_url"]
-            # Update other fields just in case
-            existing.price = p["price"]
-            existing.description = p["description"]
-            if p.get("affiliate_url"):
-                existing.affiliate_url = p["affiliate_url"]
-        else:
-            new_p = Product(
-                name=p["name"],
-                price=p["price"],
-                category=p["category"],
-                equipment_type=p.get("equipment_type"),
-                description=p["description"],
-                image_url=p["image_url"],
-                affiliate_url=p.get("affiliate_url"),
-                rating=4.8,
-                src="amazon"
-            )
-            db.session.add(new_p)
-    db.session.commit()
+    rows = [
+        dict(
+            name=p["name"],
+            price=p["price"],
+            category=p["category"],
+            equipment_type=p.get("equipment_type"),
+            description=p["description"],
+            image_url=p["image_url"],
+            affiliate_url=p.get("affiliate_url"),
+            rating=4.8,
+            src="amazon"
+        )
+        for p in products
+    ]
+    # Upsert: existing products get their image, price, description and
+    # (when given) affiliate link refreshed in the same statement.
+    stmt = sqlite_insert(Product)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={
+            "image_url": stmt.excluded.image_url,
+            "price": stmt.excluded.price,
+            "description": stmt.excluded.description,
+            "affiliate_url": func.coalesce(stmt.excluded.affiliate_url, Product.affiliate_url),
+        },
+    )
+    db.session.execute(stmt, rows)
+    clear_product_cache()
 
 def seed_badges():
     """Seed gamification badges."""
-    from models import Badge
     badges = [
         {"name": "Newcomer", "icon": "🌱", "description": "Joined GymSphere.", "criteria_json": {"type": "join"}},
         {"name": "Streak Master", "icon": "🔥", "description": "Hit a 7-day streak.", "criteria_json": {"type": "streak", "value": 7}},
@@ -172,26 +189,18 @@ def seed_badges():
         {"name": "Hydrated", "icon": "💧", "description": "Logged water intake for 3 days.", "criteria_json": {"type": "water_streak", "value": 3}},
     ]
     
-    for b in badges:
-        if not Badge.query.filter_by(name=b["name"]).first():
-            db.session.add(Badge(
-                name=b["name"],
-                icon=b["icon"],
-                description=b["description"],
-                criteria_json=b["criteria_json"]
-            ))
-    db.session.commit()
+    db.session.execute(sqlite_insert(Badge).on_conflict_do_nothing(index_elements=["name"]), badges)
     print("[SUCCESS] Badges seeded.")
 
 
 def seed_admin_user():
     """Create admin user if not exists."""
     admin_email = "admin@example.com"
-    if not User.query.filter_by(email=admin_email).first():
+    if db.session.query(User.id).filter_by(email=admin_email).scalar() is None:
         admin = User(
             fullname="Admin User",
             email=admin_email,
-            password_hash=generate_password_hash("admin123"),
+            password_hash=hash_password("admin123"),
             is_admin=True,
             created_at=datetime.utcnow(),
         )
@@ -200,36 +209,38 @@ def seed_admin_user():
         
         # Add demo progress entries for admin
         base_date = datetime.utcnow() - timedelta(days=21)
-        for i in range(3):
-            progress = UserProgress(
+        db.session.execute(insert(UserProgress), [
+            dict(
                 user_id=admin.id,
                 weight=75.0 - (i * 0.5),  # Simulate weight loss
                 logged_at=base_date + timedelta(days=i * 7),
             )
-            db.session.add(progress)
+            for i in range(3)
+        ])
 
 
 def run_seed(app: Flask):
     """Seed all data in an idempotent way."""
     with app.app_context():
         db.create_all()
-        seed_exercises()
-        seed_diet_plans()
-        seed_products()
-        seed_badges()
-        seed_admin_user()
-        db.session.commit()
+        # One transaction (and one WAL sync) for the whole seed; the
+        # helpers only stage rows.
+        with db.session.begin():
+            seed_exercises()
+            seed_diet_plans()
+            seed_products()
+            seed_badges()
+            seed_admin_user()
         print("[SUCCESS] Seed data created successfully!")
 
 
 def seed_sample_plan(app):
     """Generate a sample plan for the admin user."""
-    from utils import generate_month_plan
-    from models import UserPlan
-    
     with app.app_context():
-        admin = User.query.filter_by(is_admin=True).first()
-        if admin and not UserPlan.query.filter_by(user_id=admin.id).first():
+        # Plan generation only needs the admin's columns; raise on any
+        # relationship access rather than lazily loading it.
+        admin = User.query.options(raiseload("*")).filter_by(is_admin=True).first()
+        if admin and db.session.query(UserPlan.id).filter_by(user_id=admin.id).first() is None:
             print("Generating sample plan for admin...")
             generate_month_plan(admin)
             print("[SUCCESS] Sample plan generated.")
@@ -244,9 +255,9 @@ def seed_features(app):
 
 
         # Notifications for Admin
-        admin = User.query.filter_by(is_admin=True).first()
+        admin = User.query.options(raiseload("*")).filter_by(is_admin=True).first()
         if admin:
-            existing = Notification.query.filter_by(user_id=admin.id, type="system").first()
+            existing = db.session.query(Notification.id).filter_by(user_id=admin.id, type="system").first()
             if not existing:
                 welcome = Notification(
                     user_id=admin.id,
@@ -264,7 +275,6 @@ def seed_features(app):
 
 
 if __name__ == "__main__":
-    application = create_app()
     run_seed(application)
     seed_sample_plan(application)
     seed_features(application)
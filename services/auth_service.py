@@ -0,0 +1,37 @@
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.security import check_password_hash
+from models import User
+
+# Auth Service
+
+_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with argon2id."""
+    return _hasher.hash(password)
+
+
+def verify_password(user: User, password: str) -> bool:
+    """
+    Check a password against the user's stored hash.
+    Legacy Werkzeug (pbkdf2/scrypt) hashes are upgraded to argon2 on a
+    successful match; the caller is responsible for committing.
+    """
+    stored = user.password_hash or ""
+
+    if not stored.startswith("$argon2"):
+        if not check_password_hash(stored, password):
+            return False
+        user.password_hash = hash_password(password)
+        return True
+
+    try:
+        _hasher.verify(stored, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+    if _hasher.check_needs_rehash(stored):
+        user.password_hash = hash_password(password)
+    return True
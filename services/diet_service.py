@@ -1,17 +1,23 @@
-from typing import Dict, List
+from functools import lru_cache
+from urllib.parse import quote_plus
+from typing import Dict, List, Tuple
+from sqlalchemy import event, or_
+from sqlalchemy.exc import SQLAlchemyError
 from models import Product
 
 # Diet Service
 
-def recommend_diet(weight: float, target: float, goal: str) -> Dict:
+# Goal spellings accepted for each goal family
+FAT_LOSS_GOALS = frozenset({"fat_loss", "lose", "weight_loss"})
+MUSCLE_GAIN_GOALS = frozenset({"muscle_gain", "gain", "bulk"})
+RECOMP_GOALS = frozenset({"recomposition", "recomp"})
+
+@lru_cache(maxsize=256)
+def _diet_targets(weight: float, goal_lower: str) -> Tuple[float, float, float, float]:
     """
-    Recommend diet plan using Mifflin-St Jeor-like calculation.
+    Compute (calories, protein_g, carbs_g, fats_g) for a weight/goal pair.
+    Pure function of its arguments, so results are memoized per process.
     """
-    if weight is None or weight <= 0:
-        weight = 70  # Default fallback
-    
-    goal_lower = (goal or "").lower()
-    
     # Simplified Mifflin-St Jeor BMR estimation (using average values)
     # BMR = 10 * weight(kg) + 6.25 * height(cm) - 5 * age + 5 (male) or -161 (female)
     # Using simplified: BMR ≈ weight * 22 (rough estimate for average person)
@@ -21,27 +27,30 @@ def recommend_diet(weight: float, target: float, goal: str) -> Dict:
     activity_multiplier = 1.55
     maintenance_calories = base_bmr * activity_multiplier
     
+    is_loss = goal_lower in FAT_LOSS_GOALS
+    is_gain = goal_lower in MUSCLE_GAIN_GOALS
+    
     # Adjust calories based on goal
-    if goal_lower in ["fat_loss", "lose", "weight_loss"]:
+    if is_loss:
         calories = maintenance_calories - 400  # Deficit for fat loss
-    elif goal_lower in ["muscle_gain", "gain", "bulk"]:
+    elif is_gain:
         calories = maintenance_calories + 300  # Surplus for muscle gain
-    elif goal_lower in ["recomposition", "recomp"]:
+    elif goal_lower in RECOMP_GOALS:
         calories = maintenance_calories - 100  # Slight deficit for recomposition
     else:
         calories = maintenance_calories
     
     # Macro calculations
     # Protein: 1.8-2.2g per kg bodyweight (use 2.0g for muscle gain, 1.8g otherwise)
-    if goal_lower in ["muscle_gain", "gain", "bulk"]:
+    if is_gain:
         protein_g = weight * 2.0
     else:
         protein_g = weight * 1.8
     
     # Fats: 0.8-1.0g per kg (use 1.0g for muscle gain, 0.8g for fat loss)
-    if goal_lower in ["muscle_gain", "gain", "bulk"]:
+    if is_gain:
         fats_g = weight * 1.0
-    elif goal_lower in ["fat_loss", "lose", "weight_loss"]:
+    elif is_loss:
         fats_g = weight * 0.7  # Lower fat for fat loss
     else:
         fats_g = weight * 0.8
@@ -51,6 +60,19 @@ def recommend_diet(weight: float, target: float, goal: str) -> Dict:
     fats_cals = fats_g * 9
     remaining_cals = calories - protein_cals - fats_cals
     carbs_g = max(0, remaining_cals / 4)
+
+    return calories, protein_g, carbs_g, fats_g
+
+
+def recommend_diet(weight: float, target: float, goal: str) -> Dict:
+    """
+    Recommend diet plan using Mifflin-St Jeor-like calculation.
+    """
+    if weight is None or weight <= 0:
+        weight = 70  # Default fallback
+    
+    goal_lower = (goal or "").lower()
+    calories, protein_g, carbs_g, fats_g = _diet_targets(weight, goal_lower)
     
     # Generate summary
     goal_display = goal_lower.replace("_", " ").title() if goal_lower else "Balance"
@@ -71,6 +93,152 @@ def recommend_diet(weight: float, target: float, goal: str) -> Dict:
     }
 
 
+# High protein, lower carb, clean foods
+_MEAL_TEMPLATES_FAT_LOSS = (
+    {
+        "breakfast": "Greek yogurt with berries and almonds",
+        "lunch": "Grilled chicken salad with olive oil dressing",
+        "dinner": "Baked salmon with steamed vegetables",
+        "snacks": "Protein shake, apple with peanut butter"
+    },
+    {
+        "breakfast": "Scrambled eggs with spinach and whole grain toast",
+        "lunch": "Turkey wrap with vegetables",
+        "dinner": "Lean beef stir-fry with broccoli",
+        "snacks": "Cottage cheese, mixed nuts"
+    },
+    {
+        "breakfast": "Protein smoothie with banana and spinach",
+        "lunch": "Tuna salad with mixed greens",
+        "dinner": "Grilled chicken breast with quinoa and asparagus",
+        "snacks": "Hard-boiled eggs, cucumber slices"
+    },
+    {
+        "breakfast": "Oatmeal with protein powder and berries",
+        "lunch": "Chicken and vegetable soup",
+        "dinner": "Baked cod with sweet potato and green beans",
+        "snacks": "Greek yogurt, almonds"
+    },
+    {
+        "breakfast": "Egg white omelet with vegetables",
+        "lunch": "Grilled chicken Caesar salad (light dressing)",
+        "dinner": "Lean pork tenderloin with roasted vegetables",
+        "snacks": "Protein bar, apple"
+    },
+    {
+        "breakfast": "Cottage cheese with fruit and nuts",
+        "lunch": "Salmon and quinoa bowl",
+        "dinner": "Turkey meatballs with zucchini noodles",
+        "snacks": "Protein shake, mixed berries"
+    },
+    {
+        "breakfast": "Whole grain toast with avocado and poached eggs",
+        "lunch": "Chicken and vegetable stir-fry",
+        "dinner": "Grilled fish with brown rice and vegetables",
+        "snacks": "Greek yogurt, trail mix"
+    },
+)
+
+# High protein, high carbs, calorie-dense foods
+_MEAL_TEMPLATES_BULK = (
+    {
+        "breakfast": "Oatmeal with protein powder, banana, and peanut butter",
+        "lunch": "Chicken breast with rice and vegetables",
+        "dinner": "Beef steak with potatoes and mixed vegetables",
+        "snacks": "Protein shake, granola bar, nuts"
+    },
+    {
+        "breakfast": "Scrambled eggs with bacon and whole grain toast",
+        "lunch": "Pasta with ground turkey and marinara sauce",
+        "dinner": "Salmon with sweet potato and broccoli",
+        "snacks": "Greek yogurt with honey, protein bar"
+    },
+    {
+        "breakfast": "Protein pancakes with syrup and berries",
+        "lunch": "Chicken and rice bowl with avocado",
+        "dinner": "Pork chops with mashed potatoes and green beans",
+        "snacks": "Protein shake, banana, peanut butter"
+    },
+    {
+        "breakfast": "Breakfast burrito with eggs, cheese, and sausage",
+        "lunch": "Beef and rice stir-fry",
+        "dinner": "Grilled chicken with pasta and vegetables",
+        "snacks": "Trail mix, protein shake"
+    },
+    {
+        "breakfast": "Greek yogurt parfait with granola and fruit",
+        "lunch": "Turkey sandwich with whole grain bread",
+        "dinner": "Baked cod with rice and vegetables",
+        "snacks": "Protein bar, mixed nuts, apple"
+    },
+    {
+        "breakfast": "Omelet with cheese, vegetables, and toast",
+        "lunch": "Chicken and quinoa bowl",
+        "dinner": "Lean beef with potatoes and asparagus",
+        "snacks": "Protein shake, Greek yogurt, berries"
+    },
+    {
+        "breakfast": "Protein smoothie bowl with toppings",
+        "lunch": "Salmon with rice and vegetables",
+        "dinner": "Pork tenderloin with sweet potato and broccoli",
+        "snacks": "Protein bar, trail mix, banana"
+    },
+)
+
+# Balanced macros, clean foods (recomposition or balanced)
+_MEAL_TEMPLATES_BALANCED = (
+    {
+        "breakfast": "Greek yogurt with berries and granola",
+        "lunch": "Grilled chicken with quinoa and vegetables",
+        "dinner": "Baked salmon with sweet potato and greens",
+        "snacks": "Protein shake, mixed nuts"
+    },
+    {
+        "breakfast": "Scrambled eggs with whole grain toast and avocado",
+        "lunch": "Turkey and vegetable wrap",
+        "dinner": "Lean beef with brown rice and broccoli",
+        "snacks": "Greek yogurt, apple"
+    },
+    {
+        "breakfast": "Oatmeal with protein powder and fruit",
+        "lunch": "Chicken salad with olive oil dressing",
+        "dinner": "Grilled fish with quinoa and vegetables",
+        "snacks": "Cottage cheese, almonds"
+    },
+    {
+        "breakfast": "Protein smoothie with spinach and banana",
+        "lunch": "Salmon and rice bowl",
+        "dinner": "Chicken breast with sweet potato and asparagus",
+        "snacks": "Hard-boiled eggs, mixed berries"
+    },
+    {
+        "breakfast": "Whole grain toast with eggs and vegetables",
+        "lunch": "Tuna salad with mixed greens",
+        "dinner": "Pork tenderloin with brown rice and green beans",
+        "snacks": "Protein bar, Greek yogurt"
+    },
+    {
+        "breakfast": "Cottage cheese with fruit and nuts",
+        "lunch": "Chicken and vegetable stir-fry",
+        "dinner": "Baked cod with quinoa and vegetables",
+        "snacks": "Protein shake, trail mix"
+    },
+    {
+        "breakfast": "Egg white omelet with vegetables and cheese",
+        "lunch": "Grilled chicken Caesar salad",
+        "dinner": "Lean beef with potatoes and mixed vegetables",
+        "snacks": "Greek yogurt, protein bar"
+    },
+)
+
+_GOAL_TO_MEAL_TEMPLATES = {
+    **{g: _MEAL_TEMPLATES_FAT_LOSS for g in FAT_LOSS_GOALS},
+    **{g: _MEAL_TEMPLATES_BULK for g in MUSCLE_GAIN_GOALS},
+}
+
+_WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
 def generate_weekly_mealplan(diet: Dict, goal: str) -> List[Dict]:
     """
     Generate 7-day meal plan with breakfast, lunch, dinner, and snacks.
@@ -83,144 +251,7 @@ def generate_weekly_mealplan(diet: Dict, goal: str) -> List[Dict]:
     goal_lower = (goal or "").lower()
     
     # Meal templates adjusted by goal
-    if goal_lower in ["fat_loss", "lose", "weight_loss"]:
-        # High protein, lower carb, clean foods
-        meal_templates = [
-            {
-                "breakfast": "Greek yogurt with berries and almonds",
-                "lunch": "Grilled chicken salad with olive oil dressing",
-                "dinner": "Baked salmon with steamed vegetables",
-                "snacks": "Protein shake, apple with peanut butter"
-            },
-            {
-                "breakfast": "Scrambled eggs with spinach and whole grain toast",
-                "lunch": "Turkey wrap with vegetables",
-                "dinner": "Lean beef stir-fry with broccoli",
-                "snacks": "Cottage cheese, mixed nuts"
-            },
-            {
-                "breakfast": "Protein smoothie with banana and spinach",
-                "lunch": "Tuna salad with mixed greens",
-                "dinner": "Grilled chicken breast with quinoa and asparagus",
-                "snacks": "Hard-boiled eggs, cucumber slices"
-            },
-            {
-                "breakfast": "Oatmeal with protein powder and berries",
-                "lunch": "Chicken and vegetable soup",
-                "dinner": "Baked cod with sweet potato and green beans",
-                "snacks": "Greek yogurt, almonds"
-            },
-            {
-                "breakfast": "Egg white omelet with vegetables",
-                "lunch": "Grilled chicken Caesar salad (light dressing)",
-                "dinner": "Lean pork tenderloin with roasted vegetables",
-                "snacks": "Protein bar, apple"
-            },
-            {
-                "breakfast": "Cottage cheese with fruit and nuts",
-                "lunch": "Salmon and quinoa bowl",
-                "dinner": "Turkey meatballs with zucchini noodles",
-                "snacks": "Protein shake, mixed berries"
-            },
-            {
-                "breakfast": "Whole grain toast with avocado and poached eggs",
-                "lunch": "Chicken and vegetable stir-fry",
-                "dinner": "Grilled fish with brown rice and vegetables",
-                "snacks": "Greek yogurt, trail mix"
-            }
-        ]
-    elif goal_lower in ["muscle_gain", "gain", "bulk"]:
-        # High protein, high carbs, calorie-dense foods
-        meal_templates = [
-            {
-                "breakfast": "Oatmeal with protein powder, banana, and peanut butter",
-                "lunch": "Chicken breast with rice and vegetables",
-                "dinner": "Beef steak with potatoes and mixed vegetables",
-                "snacks": "Protein shake, granola bar, nuts"
-            },
-            {
-                "breakfast": "Scrambled eggs with bacon and whole grain toast",
-                "lunch": "Pasta with ground turkey and marinara sauce",
-                "dinner": "Salmon with sweet potato and broccoli",
-                "snacks": "Greek yogurt with honey, protein bar"
-            },
-            {
-                "breakfast": "Protein pancakes with syrup and berries",
-                "lunch": "Chicken and rice bowl with avocado",
-                "dinner": "Pork chops with mashed potatoes and green beans",
-                "snacks": "Protein shake, banana, peanut butter"
-            },
-            {
-                "breakfast": "Breakfast burrito with eggs, cheese, and sausage",
-                "lunch": "Beef and rice stir-fry",
-                "dinner": "Grilled chicken with pasta and vegetables",
-                "snacks": "Trail mix, protein shake"
-            },
-            {
-                "breakfast": "Greek yogurt parfait with granola and fruit",
-                "lunch": "Turkey sandwich with whole grain bread",
-                "dinner": "Baked cod with rice and vegetables",
-                "snacks": "Protein bar, mixed nuts, apple"
-            },
-            {
-                "breakfast": "Omelet with cheese, vegetables, and toast",
-                "lunch": "Chicken and quinoa bowl",
-                "dinner": "Lean beef with potatoes and asparagus",
-                "snacks": "Protein shake, Greek yogurt, berries"
-            },
-            {
-                "breakfast": "Protein smoothie bowl with toppings",
-                "lunch": "Salmon with rice and vegetables",
-                "dinner": "Pork tenderloin with sweet potato and broccoli",
-                "snacks": "Protein bar, trail mix, banana"
-            }
-        ]
-    else:  # recomposition or balanced
-        # Balanced macros, clean foods
-        meal_templates = [
-            {
-                "breakfast": "Greek yogurt with berries and granola",
-                "lunch": "Grilled chicken with quinoa and vegetables",
-                "dinner": "Baked salmon with sweet potato and greens",
-                "snacks": "Protein shake, mixed nuts"
-            },
-            {
-                "breakfast": "Scrambled eggs with whole grain toast and avocado",
-                "lunch": "Turkey and vegetable wrap",
-                "dinner": "Lean beef with brown rice and broccoli",
-                "snacks": "Greek yogurt, apple"
-            },
-            {
-                "breakfast": "Oatmeal with protein powder and fruit",
-                "lunch": "Chicken salad with olive oil dressing",
-                "dinner": "Grilled fish with quinoa and vegetables",
-                "snacks": "Cottage cheese, almonds"
-            },
-            {
-                "breakfast": "Protein smoothie with spinach and banana",
-                "lunch": "Salmon and rice bowl",
-                "dinner": "Chicken breast with sweet potato and asparagus",
-                "snacks": "Hard-boiled eggs, mixed berries"
-            },
-            {
-                "breakfast": "Whole grain toast with eggs and vegetables",
-                "lunch": "Tuna salad with mixed greens",
-                "dinner": "Pork tenderloin with brown rice and green beans",
-                "snacks": "Protein bar, Greek yogurt"
-            },
-            {
-                "breakfast": "Cottage cheese with fruit and nuts",
-                "lunch": "Chicken and vegetable stir-fry",
-                "dinner": "Baked cod with quinoa and vegetables",
-                "snacks": "Protein shake, trail mix"
-            },
-            {
-                "breakfast": "Egg white omelet with vegetables and cheese",
-                "lunch": "Grilled chicken Caesar salad",
-                "dinner": "Lean beef with potatoes and mixed vegetables",
-                "snacks": "Greek yogurt, protein bar"
-            }
-        ]
+    meal_templates = _GOAL_TO_MEAL_TEMPLATES.get(goal_lower, _MEAL_TEMPLATES_BALANCED)
     
     # Generate 7-day plan
     weekly_plan = []
@@ -228,7 +259,7 @@ def generate_weekly_mealplan(diet: Dict, goal: str) -> List[Dict]:
         day_plan = meal_templates[day_num % len(meal_templates)]
         weekly_plan.append({
             "day": day_num + 1,
-            "day_name": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"][day_num],
+            "day_name": _WEEKDAY_NAMES[day_num],
             "calories": round(calories),
             "macros": {
                 "protein_g": round(protein_g),
@@ -246,119 +277,172 @@ def generate_weekly_mealplan(diet: Dict, goal: str) -> List[Dict]:
     return weekly_plan
 
 
+# Goal to equipment/supplements mapping
+_RECOMMENDATIONS_MAP = {
+    "fat_loss": ("skipping_rope", "resistance_bands", "yoga_mat", "whey_isolate", "smart_watch"),
+    "muscle_gain": ("dumbbells", "creatine", "whey_protein", "weight_bench", "lifting_straps"),
+    "body_recomp": ("adjustable_dumbbells", "yoga_mat", "protein_powder", "kettlebell"),
+    "core_strength": ("ab_wheel", "sliders", "yoga_mat", "medicine_ball"),
+    "flexibility": ("yoga_mat", "foam_roller", "yoga_blocks")
+}
+
+# Default to full body / general
+_DEFAULT_RECOMMENDATIONS = ("resistance_bands", "dumbbells", "yoga_mat", "water_bottle")
+
+# "Smart" defaults (affiliate placeholders) for items missing from the DB
+_DEFAULTS_DB = {
+    "skipping_rope": {"name": "Pro Speed Rope", "price": 14.99, "img": "https://m.media-amazon.com/images/I/71q+9gE-cAL._AC_SX679_.jpg"},
+    "resistance_bands": {"name": "Heavy Duty Bands Set", "price": 29.99, "img": "https://m.media-amazon.com/images/I/71D0-l-rMzL._AC_SX679_.jpg"},
+    "yoga_mat": {"name": "Non-Slip Yoga Mat", "price": 45.00, "img": "https://m.media-amazon.com/images/I/81+6iM6C5XL._AC_SX679_.jpg"},
+    "whey_isolate": {"name": "Gold Standard Whey", "price": 69.99, "img": "https://m.media-amazon.com/images/I/71+6P+H6+pL._AC_SX679_.jpg"},
+    "smart_watch": {"name": "Fitness Tracker Pro", "price": 129.99, "img": "https://m.media-amazon.com/images/I/61s+N0+1sWL._AC_SX679_.jpg"},
+    "dumbbells": {"name": "Hex Dumbbell Pair (10kg)", "price": 59.99, "img": "https://m.media-amazon.com/images/I/71ShRz-BcxL._AC_SX679_.jpg"},
+    "creatine": {"name": "Micronized Creatine", "price": 24.99, "img": "https://m.media-amazon.com/images/I/71t+vO-4KqL._AC_SX679_.jpg"},
+    "ab_wheel": {"name": "Core Roller", "price": 19.99, "img": "https://m.media-amazon.com/images/I/71-Wl6+FmTL._AC_SX679_.jpg"},
+    "adjustable_dumbbells": {"name": "SelectTech Dumbbells", "price": 299.00, "img": "https://m.media-amazon.com/images/I/71+pOdQ7iKL._AC_SX679_.jpg"}
+}
+
+
+# Affiliate search link for placeholder items; q must be URL-encoded
+_AMAZON_SEARCH_URL = "https://www.amazon.com/s?k={q}&tag=gymsphere-20"
+
+
+@lru_cache(maxsize=32)
+def _db_matches(target_items: Tuple[str, ...]) -> Tuple[Tuple[str, Dict], ...]:
+    """
+    (item_key, product dict) for each target item that has a DB product.
+    Memoized per item set; clear_product_cache() drops it on Product writes.
+    """
+    # Simple logic: partial name match or category match
+    # For production, we'd have a tag system
+    terms = [(item_key, item_key.replace('_', ' ')) for item_key in target_items]
+    # One scan for every candidate instead of one LIKE query per item
+    candidates = Product.query.filter(
+        or_(*(Product.name.ilike(f"%{term}%") for _, term in terms))
+    ).order_by(Product.id).all()
+    matches = []
+    for item_key, term in terms:
+        # Search by name similar to item key
+        match = next((p for p in candidates if term in p.name.lower()), None)
+        if match:
+            matches.append((item_key, {
+                "id": match.id,
+                "name": match.name,
+                "price": float(match.price),
+                "image_url": match.image_url or "https://placehold.co/200x200?text=GymSphere",
+                "rating": match.rating or 4.5,
+                "src": match.src or "local",
+                "affiliate_url": match.affiliate_url or "#"
+            }))
+    return tuple(matches)
+
+
+# Bumped on every product change; part of the /api/shop response cache key
+# so cached responses for every goal go stale with the memoized matches
+_product_version = 0
+
+
+def product_cache_version() -> int:
+    return _product_version
+
+
+def clear_product_cache() -> None:
+    """
+    Forget memoized product matches and cached shop responses (after the
+    products table changes). Per process: a separate seeding process
+    doesn't reach running workers, which catch up on restart (matches)
+    or after CACHE_DEFAULT_TIMEOUT (responses).
+    """
+    global _product_version
+    _db_matches.cache_clear()
+    _product_version += 1
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+@event.listens_for(Product, "after_delete")
+def _product_changed(mapper, connection, target):
+    clear_product_cache()
+
+
 def recommend_shopping(goal: str, app=None) -> List[Dict]:
     """
     Recommend shopping products based on goal with smart affiliate links.
     """
     goal_lower = (goal or "").lower()
     
-    # Goal to equipment/supplements mapping
-    recommendations_map = {
-        "fat_loss": ["skipping_rope", "resistance_bands", "yoga_mat", "whey_isolate", "smart_watch"],
-        "muscle_gain": ["dumbbells", "creatine", "whey_protein", "weight_bench", "lifting_straps"],
-        "body_recomp": ["adjustable_dumbbells", "yoga_mat", "protein_powder", "kettlebell"],
-        "core_strength": ["ab_wheel", "sliders", "yoga_mat", "medicine_ball"],
-        "flexibility": ["yoga_mat", "foam_roller", "yoga_blocks"]
-    }
-    
-    # Default to full body / general
-    target_items = recommendations_map.get(goal_lower, ["resistance_bands", "dumbbells", "yoga_mat", "water_bottle"])
+    target_items = _RECOMMENDATIONS_MAP.get(goal_lower, _DEFAULT_RECOMMENDATIONS)
     
     products_list = []
+    # Item keys already covered and product names already listed
+    found_keys = set()
+    seen_names = set()
     
     # 1. Try DB matches first
     if app:
         try:
             with app.app_context():
-                # Simple logic: partial name match or category match
-                # For production, we'd have a tag system
-                for item_key in target_items:
-                    # Search by name similar to item key
-                    match = Product.query.filter(Product.name.ilike(f"%{item_key.replace('_', ' ')}%")).first()
-                    if match:
-                        products_list.append({
-                            "id": match.id,
-                            "name": match.name,
-                            "price": float(match.price),
-                            "image_url": match.image_url or "https://placehold.co/200x200?text=GymSphere",
-                            "rating": match.rating or 4.5,
-                            "src": match.src or "local",
-                            "affiliate_url": match.affiliate_url or "#"
-                        })
-        except Exception:
-            pass
+                matches = _db_matches(target_items)
+        except SQLAlchemyError:
+            # Shop still works from the placeholders if the lookup fails
+            matches = ()
+        for item_key, product in matches:
+            found_keys.add(item_key)
+            seen_names.add(product["name"].lower())
+            # Copy so callers can't mutate the cached entries
+            products_list.append(dict(product))
             
     # 2. Fill gaps with "Smart" defaults (Affiliate Placeholders)
     # If we didn't find enough items in DB, we generate them dynamically
     
-    defaults_db = {
-        "skipping_rope": {"name": "Pro Speed Rope", "price": 14.99, "img": "https://m.media-amazon.com/images/I/71q+9gE-cAL._AC_SX679_.jpg"},
-        "resistance_bands": {"name": "Heavy Duty Bands Set", "price": 29.99, "img": "https://m.media-amazon.com/images/I/71D0-l-rMzL._AC_SX679_.jpg"},
-        "yoga_mat": {"name": "Non-Slip Yoga Mat", "price": 45.00, "img": "https://m.media-amazon.com/images/I/81+6iM6C5XL._AC_SX679_.jpg"},
-        "whey_isolate": {"name": "Gold Standard Whey", "price": 69.99, "img": "https://m.media-amazon.com/images/I/71+6P+H6+pL._AC_SX679_.jpg"},
-        "smart_watch": {"name": "Fitness Tracker Pro", "price": 129.99, "img": "https://m.media-amazon.com/images/I/61s+N0+1sWL._AC_SX679_.jpg"},
-        "dumbbells": {"name": "Hex Dumbbell Pair (10kg)", "price": 59.99, "img": "https://m.media-amazon.com/images/I/71ShRz-BcxL._AC_SX679_.jpg"},
-        "creatine": {"name": "Micronized Creatine", "price": 24.99, "img": "https://m.media-amazon.com/images/I/71t+vO-4KqL._AC_SX679_.jpg"},
-        "ab_wheel": {"name": "Core Roller", "price": 19.99, "img": "https://m.media-amazon.com/images/I/71-Wl6+FmTL._AC_SX679_.jpg"},
-        "adjustable_dumbbells": {"name": "SelectTech Dumbbells", "price": 299.00, "img": "https://m.media-amazon.com/images/I/71+pOdQ7iKL._AC_SX679_.jpg"}
-    }
-    
     needed = 5 - len(products_list)
     if needed > 0:
         for item_key in target_items:
             if len(products_list) >= 6: break
             
             # If not already present
-            if not any(p['name'].lower() in item_key.replace('_', ' ') for p in products_list):
-                def_item = defaults_db.get(item_key, {"name": item_key.replace('_', ' ').title(), "price": 25.00, "img": ""})
-                
-                # Generate valid Amazon Search Link
-                search_term = def_item["name"].replace(" ", "+")
-                link = f"https://www.amazon.com/s?k={search_term}&tag=gymsphere-20"
-                
-                products_list.append({
-                    "id": None,
-                    "name": def_item["name"],
-                    "price": def_item["price"],
-                    "image_url": def_item["img"] or "https://placehold.co/200x200?text=Product",
-                    "rating": 4.8,
-                    "src": "amazon",
-                    "affiliate_url": link
-                })
+            if item_key in found_keys:
+                continue
+            def_item = _DEFAULTS_DB.get(item_key, {"name": item_key.replace('_', ' ').title(), "price": 25.00, "img": ""})
+            name_lc = def_item["name"].lower()
+            if name_lc in seen_names:
+                continue
+            seen_names.add(name_lc)
+            
+            # Generate valid Amazon Search Link
+            link = _AMAZON_SEARCH_URL.format(q=quote_plus(def_item["name"]))
+            
+            products_list.append({
+                "id": None,
+                "name": def_item["name"],
+                "price": def_item["price"],
+                "image_url": def_item["img"] or "https://placehold.co/200x200?text=Product",
+                "rating": 4.8,
+                "src": "amazon",
+                "affiliate_url": link
+            })
                 
     return products_list
 
 
+# Per-meal (non-veg, veg) options; the non-veg breakfast is for muscle gain only
+_BREAKFAST_OPTIONS = ("Omelette with spinach & turkey bacon, oatmeal", "Greek yogurt parfait with berries & granola")
+_LUNCH_OPTIONS = ("Grilled chicken breast, quinoa, roasted veggies", "Lentil soup, brown rice, avocado salad")
+_DINNER_OPTIONS = ("Baked salmon/fish, sweet potato, steamed broccoli", "Tofu stir-fry with mixed vegetables")
+_SNACKS = "Protein shake, almonds, apple"
+# Rotated by day index
+_MEAL_VARIATIONS = (" (Option A)", " (Option B)", " (Spicy)", " (Herbal)")
+
+
 def recommend_meals_for_day(calories: int, macros: Dict, preference: str, goal: str, day_index: int) -> Dict:
     """
     Generate a full day of eating based on calories/macros and preferences.
     """
     # Base templates
     is_nonveg = preference == "nonveg" or preference == "mixed"
-    
-    # Helper to generate meal string
-    def get_meal(type_name):
-        base = ""
-        if type_name == "breakfast":
-            if is_nonveg and goal == "muscle_gain":
-                base = "Omelette with spinach & turkey bacon, oatmeal"
-            else:
-                base = "Greek yogurt parfait with berries & granola"
-        elif type_name == "lunch":
-            if is_nonveg:
-                base = "Grilled chicken breast, quinoa, roasted veggies"
-            else:
-                base = "Lentil soup, brown rice, avocado salad"
-        elif type_name == "dinner":
-            if is_nonveg:
-                base = "Baked salmon/fish, sweet potato, steamed broccoli"
-            else:
-                base = "Tofu stir-fry with mixed vegetables"
-        elif type_name == "snacks":
-            base = "Protein shake, almonds, apple"
-        
-        variations = [" (Option A)", " (Option B)", " (Spicy)", " (Herbal)"]
-        return base + variations[day_index % 4]
+    option = 0 if is_nonveg else 1
+    variation = _MEAL_VARIATIONS[day_index % len(_MEAL_VARIATIONS)]
+    breakfast = _BREAKFAST_OPTIONS[0 if is_nonveg and goal == "muscle_gain" else 1]
 
     return {
         "calories": calories,
@@ -366,10 +450,10 @@ def recommend_meals_for_day(calories: int, macros: Dict, preference: str, goal:
         "carbs_g": macros.get("carbs_g"),
         "fats_g": macros.get("fats_g"),
         "meals": {
-            "breakfast": get_meal("breakfast"),
-            "lunch": get_meal("lunch"),
-            "dinner": get_meal("dinner"),
-            "snacks": get_meal("snacks")
+            "breakfast": breakfast + variation,
+            "lunch": _LUNCH_OPTIONS[option] + variation,
+            "dinner": _DINNER_OPTIONS[option] + variation,
+            "snacks": _SNACKS + variation
         },
         "note": f"Focus on hitting ~{macros.get('protein_g')}g protein today."
     }
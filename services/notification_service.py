@@ -1,12 +1,22 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from models import Notification, User, DailyPlanEntry, UserPlan, db
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from extensions import cache
+from models import Notification, User, DailyPlanEntry, db
+from services.plan_service import get_active_plan
 from services.streak_service import calculate_streaks
 
 # Notification Service
 
-def create_notification(user, title, message, type="info", payload=None):
-    """Helper to create and commit a notification."""
+# Single worker so checks for the same user never race each other
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notifications")
+
+# Dashboard refreshes within this window don't re-run the engine
+NOTIF_CHECK_COOLDOWN = timedelta(minutes=15)
+
+def create_notification(user, title, message, type="info", payload=None, commit=True):
+    """Helper to create a notification; commit=False leaves it pending in the session."""
     try:
         n = Notification(
             user_id=user.id,
@@ -17,12 +27,41 @@ def create_notification(user, title, message, type="info", payload=None):
             created_at=datetime.utcnow()
         )
         db.session.add(n)
-        db.session.commit()
+        if commit:
+            db.session.commit()
         return n
     except Exception as e:
         print(f"Error creating notification: {e}")
         return None
 
+def _recent_notifications(user: User, now: Optional[datetime] = None) -> List[Tuple[str, bool, datetime]]:
+    """
+    (title, is_read, created_at) for everything the dedupe checks look at:
+    unread notifications plus any created since yesterday. One query.
+    """
+    since = datetime.combine((now or datetime.utcnow()).date() - timedelta(days=1), time.min)
+    return db.session.query(Notification.title, Notification.is_read, Notification.created_at).filter(
+        Notification.user_id == user.id,
+        db.or_(Notification.is_read.is_(False), Notification.created_at >= since),
+    ).all()
+
+def _has_unread(recent, title: str) -> bool:
+    return any(t == title and not is_read for t, is_read, _ in recent)
+
+def _sent_since(recent, title: str, since: datetime) -> bool:
+    return any(t == title and created >= since for t, _, created in recent)
+
+def _load_plan_window(user: User, now: Optional[datetime] = None) -> Dict[date, DailyPlanEntry]:
+    """Yesterday's and tomorrow's entries of the user's current plan, by date."""
+    plan = get_active_plan(user)
+    if not plan: return {}
+    today = (now or datetime.utcnow()).date()
+    days = [today - timedelta(days=1), today + timedelta(days=1)]
+    entries = DailyPlanEntry.query.filter(
+        DailyPlanEntry.plan_id == plan.id, DailyPlanEntry.date.in_(days)
+    ).all()
+    return {e.date: e for e in entries}
+
 def check_notifications_engine(user: User) -> None:
     """
     Master function to check and generate all smart notifications.
@@ -30,39 +69,71 @@ def check_notifications_engine(user: User) -> None:
     """
     if not user: return
 
+    # One clock read for the whole run so every check agrees on "today"
+    now = datetime.utcnow()
+
     # 1. Update & Check Streaks (Core Logic)
+    # Saved with the notifications by the single commit at the end
     streaks = calculate_streaks(user)
     
+    # Existing notifications for the "already sent" checks below, and the
+    # plan entries around today, each fetched once
+    recent = _recent_notifications(user, now)
+    window = _load_plan_window(user, now)
+    
     # 2. Tomorrow's Plan (Evening Reminder)
     # Trigger after 6 PM
-    if datetime.utcnow().hour >= 18:
-        schedule_tomorrow_plan_notification(user)
+    if now.hour >= 18:
+        schedule_tomorrow_plan_notification(user, recent, window, now)
 
     # 3. Morning Motivation (Daily)
-    schedule_morning_reminder(user)
+    schedule_morning_reminder(user, recent, now)
 
     # 4. Missed Workout Alert (Yesterday)
-    check_missed_workout(user)
+    check_missed_workout(user, recent, window, now)
 
     # 5. Weekly Summary (Sunday Evening)
-    if datetime.utcnow().weekday() == 6 and datetime.utcnow().hour >= 18:
+    if now.weekday() == 6 and now.hour >= 18:
         generate_weekly_summary(user)
 
+    # The checks above only stage their notifications; write them in one go
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error saving notifications: {e}")
+
 
-def schedule_tomorrow_plan_notification(user: User):
+def queue_notifications_check(app, user_id: int) -> None:
+    """
+    Run check_notifications_engine for a user off the request thread,
+    at most once per NOTIF_CHECK_COOLDOWN.
+    """
+    # cache.add only succeeds if the key is absent, so concurrent loads queue once
+    if not cache.add(f"notif_check:{user_id}", True, timeout=int(NOTIF_CHECK_COOLDOWN.total_seconds())):
+        return
+    _executor.submit(_run_notifications_check, app, user_id)
+
+
+def _run_notifications_check(app, user_id: int) -> None:
+    with app.app_context():
+        try:
+            check_notifications_engine(db.session.get(User, user_id))
+        except Exception as e:
+            print(f"Notification engine error: {e}")
+
+
+def schedule_tomorrow_plan_notification(user: User, recent=None, window=None, now=None):
     """Check tomorrow's plan and notify user."""
+    now = now or datetime.utcnow()
+    tomorrow = now.date() + timedelta(days=1)
     
-    tomorrow = datetime.utcnow().date() + timedelta(days=1)
-    
-    # Find active plan
-    plan = UserPlan.query.filter(UserPlan.user_id == user.id, UserPlan.end_date >= tomorrow).first()
-    if not plan: return
-
-    entry = DailyPlanEntry.query.filter_by(plan_id=plan.id, date=tomorrow).first()
+    # Tomorrow's entry in the active plan
+    entry = (window if window is not None else _load_plan_window(user, now)).get(tomorrow)
     if not entry: return
 
     title = "Tomorrow's Plan Ready 📅"
-    if Notification.query.filter_by(user_id=user.id, title=title, is_read=False).first():
+    if _has_unread(recent if recent is not None else _recent_notifications(user, now), title):
         return
 
     if entry.is_exercise_day:
@@ -73,48 +144,42 @@ def schedule_tomorrow_plan_notification(user: User):
     else:
         msg = "Tomorrow is a Rest Day. Focus on recovery and nutrition."
         
-    create_notification(user, title, msg, type="plan", payload={"date": str(tomorrow)})
+    create_notification(user, title, msg, type="plan", payload={"date": str(tomorrow)}, commit=False)
 
 
-def schedule_morning_reminder(user: User):
+def schedule_morning_reminder(user: User, recent=None, now=None):
     """Daily AI Coach motivation."""
-    today = datetime.utcnow().date()
+    now = now or datetime.utcnow()
+    today = now.date()
     title = "Coach Update 🤖"
     
     # Only one per day
-    if Notification.query.filter(
-        Notification.user_id == user.id, 
-        Notification.title == title,
-        Notification.created_at >= datetime.utcnow().replace(hour=0, minute=0)
-    ).first():
+    if _sent_since(recent if recent is not None else _recent_notifications(user, now), title, datetime.combine(today, time.min)):
         return
     
     msg = get_ai_coach_message(user)
-    create_notification(user, title, msg, type="motivation")
+    create_notification(user, title, msg, type="motivation", commit=False)
 
 
-def check_missed_workout(user: User):
+def check_missed_workout(user: User, recent=None, window=None, now=None):
     """Check if yesterday's workout was missed."""
+    now = now or datetime.utcnow()
+    yesterday = now.date() - timedelta(days=1)
     
-    yesterday = datetime.utcnow().date() - timedelta(days=1)
-    
-    # active plan covering yesterday
-    plan = UserPlan.query.filter(UserPlan.user_id == user.id, UserPlan.start_date <= yesterday).first()
-    if not plan: return
-    
-    entry = DailyPlanEntry.query.filter_by(plan_id=plan.id, date=yesterday).first()
+    # Yesterday's entry in the active plan
+    entry = (window if window is not None else _load_plan_window(user, now)).get(yesterday)
     
     # If it was exercise day, and NOT completed
     if entry and entry.is_exercise_day and not entry.is_exercise_completed:
         title = "Missed Workout ⚠️"
-        if not Notification.query.filter_by(user_id=user.id, title=title, created_at=yesterday).first():
-             create_notification(user, title, "You missed yesterday's workout. Don't let it break your momentum! Get back on track today.", type="alert")
+        # One alert per missed day: it is raised the day after
+        today_start = datetime.combine(yesterday + timedelta(days=1), time.min)
+        if not _sent_since(recent if recent is not None else _recent_notifications(user, now), title, today_start):
+             create_notification(user, title, "You missed yesterday's workout. Don't let it break your momentum! Get back on track today.", type="alert", commit=False)
 
 
 def get_ai_coach_message(user: User) -> str:
     """Generate rule-based AI coach message."""
-    import random
-    
     streak = user.workout_streak
     
     if streak > 5:
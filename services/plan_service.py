@@ -1,24 +1,53 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import orjson
+from sqlalchemy import insert
 from models import User, UserPlan, DailyPlanEntry, db
 from services.workout_service import recommend_workout_day
 from services.diet_service import recommend_meals_for_day, recommend_diet
 
 # Plan Service
 
-def generate_month_plan(user: User, start_date: Optional[str] = None) -> Optional[UserPlan]:
+def get_active_plan(user: User) -> Optional[UserPlan]:
     """
-    Generate a 30-day workout and diet plan.
+    Return the user's current (most recently generated) plan.
+    Uses User.active_plan_id, so repeat calls in a request hit the identity map.
     """
-    
-    if not start_date:
-        start_date_obj = datetime.utcnow().date()
-    else:
-        try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-        except:
-            start_date_obj = datetime.utcnow().date()
+    if user.active_plan_id:
+        plan = db.session.get(UserPlan, user.active_plan_id)
+        if plan is not None:
+            return plan
+    # Pointer unset or stale (plan deleted): fall back to the latest plan
+    return UserPlan.query.filter_by(user_id=user.id).order_by(UserPlan.created_at.desc()).first()
+
+PLAN_DAYS = 30
+_DAY_OFFSETS = tuple(timedelta(days=i) for i in range(PLAN_DAYS))
+# Rule: Every 3rd day is a Rest Day (Day 3, 6, 9...)
+_IS_BREAK = tuple((i + 1) % 3 == 0 for i in range(PLAN_DAYS))
+
+@lru_cache(maxsize=256)
+def _month_diet_payloads(calories: int, protein_g: int, carbs_g: int, fats_g: int,
+                         preference: str, goal: str) -> Tuple[str, ...]:
+    """
+    A plan's daily diet payloads for a diet target, built once per process.
+    Already JSON-encoded: diet_payload stores the strings as-is on insert.
+    """
+    macros = {"protein_g": protein_g, "carbs_g": carbs_g, "fats_g": fats_g}
+    return tuple(
+        orjson.dumps(recommend_meals_for_day(calories, macros, preference, goal, i)).decode()
+        for i in range(PLAN_DAYS)
+    )
+
+def _parse_start_date(start_date: Optional[str]) -> date:
+    try:
+        return date.fromisoformat(start_date) if start_date else datetime.utcnow().date()
+    except (TypeError, ValueError):
+        # Not a YYYY-MM-DD string (start_date comes straight from request JSON)
+        return datetime.utcnow().date()
 
+def _plan_fields(user: User, start_date_obj: date) -> Tuple[Dict, Tuple[str, ...]]:
+    """UserPlan column values for a new plan, plus its daily diet payloads."""
     goal = user.goal or "maintain"
     fitness_level = user.fitness_level or "beginner"
     preference = "nonveg" # Default preference
@@ -26,44 +55,84 @@ def generate_month_plan(user: User, start_date: Optional[str] = None) -> Optiona
     diet_info = recommend_diet(user.weight_kg, user.target_weight_kg, goal)
     calories = diet_info["calories"]
     macros = diet_info["macros"]
-
-    plan = UserPlan(
-        user_id=user.id,
-        plan_type="workout+diet",
-        goal=goal,
-        preference=preference,
-        start_date=start_date_obj,
-        end_date=start_date_obj + timedelta(days=29),
-        frequency_per_week=5,
-        fitness_level=fitness_level,
-        metadata_json={"total_days": 30}
+    # Users sharing a diet target share the same meals, so build them once
+    diet_by_day = _month_diet_payloads(
+        calories, macros["protein_g"], macros["carbs_g"], macros["fats_g"], preference, goal
     )
-    
-    entries = []
-    
-    for i in range(30):
-        current_date = start_date_obj + timedelta(days=i)
-        
-        # Rule: Every 3rd day is a Rest Day (Day 3, 6, 9...)
-        is_break = ((i + 1) % 3 == 0)
-            
-        diet_payload = recommend_meals_for_day(calories, macros, preference, goal, i)
-        
-        exercise_payload = []
-        if not is_break:
-            exercise_payload = recommend_workout_day(goal, fitness_level, i, is_break)
-        
-        entry = DailyPlanEntry(
-            date=current_date,
-            is_exercise_day=not is_break,
-            exercise_payload=exercise_payload,
-            diet_payload=diet_payload,
-            streak_group=1
-        )
-        entries.append(entry)
-    
-    plan.daily_entries = entries
+
+    fields = {
+        "user_id": user.id,
+        "plan_type": "workout+diet",
+        "goal": goal,
+        "preference": preference,
+        "start_date": start_date_obj,
+        "end_date": start_date_obj + _DAY_OFFSETS[-1],
+        "frequency_per_week": 5,
+        "fitness_level": fitness_level,
+        "metadata_json": {"total_days": PLAN_DAYS},
+    }
+    return fields, diet_by_day
+
+def _entry_rows(plan_id: int, fields: Dict, diet_by_day: Tuple[str, ...]) -> List[Dict]:
+    """DailyPlanEntry rows for a plan built by _plan_fields."""
+    start_date_obj, goal, fitness_level = fields["start_date"], fields["goal"], fields["fitness_level"]
+    return [
+        {
+            "plan_id": plan_id,
+            "date": start_date_obj + offset,
+            "is_exercise_day": not is_break,
+            "exercise_payload": [] if is_break else recommend_workout_day(goal, fitness_level, i, is_break),
+            "diet_payload": diet_by_day[i],
+            "streak_group": 1,
+        }
+        for i, (offset, is_break) in enumerate(zip(_DAY_OFFSETS, _IS_BREAK))
+    ]
+
+def generate_month_plan(user: User, start_date: Optional[str] = None) -> Optional[UserPlan]:
+    """
+    Generate a 30-day workout and diet plan.
+    """
+    fields, diet_by_day = _plan_fields(user, _parse_start_date(start_date))
+    plan = UserPlan(**fields)
     
     db.session.add(plan)
+    db.session.flush()
+    
+    # One multi-row INSERT instead of an ORM object per day through the unit of work
+    db.session.execute(insert(DailyPlanEntry), _entry_rows(plan.id, fields, diet_by_day))
+    user.active_plan_id = plan.id
     db.session.commit()
     return plan
+
+def generate_month_plans_batch(users: List[User], start_date: Optional[str] = None) -> List[int]:
+    """
+    generate_month_plan for many users (signup batches, migrations) in one
+    transaction: one INSERT ... RETURNING for the plans and one executemany
+    for all their entries. Returns the new plan ids in user order
+    (duplicate users get one plan).
+    """
+    # One plan per user
+    users = list({user.id: user for user in users}.values())
+    if not users:
+        return []
+    start_date_obj = _parse_start_date(start_date)
+    built = [_plan_fields(user, start_date_obj) for user in users]
+    
+    # SQLAlchemy pages multi-row inserts itself (insertmanyvalues), so large
+    # batches stay under SQLite's bound-parameter limit. RETURNING order isn't
+    # guaranteed to follow the parameters, so map ids back by user_id.
+    inserted = db.session.execute(
+        insert(UserPlan).returning(UserPlan.id, UserPlan.user_id),
+        [fields for fields, _ in built],
+    )
+    plan_id_by_user = {user_id: plan_id for plan_id, user_id in inserted}
+    plan_ids = [plan_id_by_user[user.id] for user in users]
+    db.session.execute(insert(DailyPlanEntry), [
+        row
+        for plan_id, (fields, diet_by_day) in zip(plan_ids, built)
+        for row in _entry_rows(plan_id, fields, diet_by_day)
+    ])
+    for user, plan_id in zip(users, plan_ids):
+        user.active_plan_id = plan_id
+    db.session.commit()
+    return plan_ids
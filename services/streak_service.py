@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from models import User, DailyPlanEntry, UserPlan, db
+from typing import Dict, Optional, Sequence, Tuple
+from models import User, UserPlan, DailyPlanEntry, db
+from services.diet_service import FAT_LOSS_GOALS, MUSCLE_GAIN_GOALS, RECOMP_GOALS
+from services.plan_service import get_active_plan
 
 # Streak Service
 
@@ -20,13 +22,13 @@ def estimate_transformation_days(weight: float, target: float, goal: str) -> int
     goal_lower = (goal or "").lower()
     
     # Rate ranges per week (kg/week)
-    if goal_lower in ["fat_loss", "lose", "weight_loss"]:
+    if goal_lower in FAT_LOSS_GOALS:
         # Fat loss: 0.4-0.7 kg/week (use average 0.55)
         rate_per_week = 0.55
-    elif goal_lower in ["muscle_gain", "gain", "bulk"]:
+    elif goal_lower in MUSCLE_GAIN_GOALS:
         # Muscle gain: 0.2-0.4 kg/week (use average 0.3)
         rate_per_week = 0.3
-    elif goal_lower in ["recomposition", "recomp"]:
+    elif goal_lower in RECOMP_GOALS:
         # Recomposition: slower progression (0.15-0.25 kg/week, use 0.2)
         rate_per_week = 0.2
     else:
@@ -38,96 +40,175 @@ def estimate_transformation_days(weight: float, target: float, goal: str) -> int
     
     return days
 
-def calculate_streaks(user: User) -> Dict:
+_NO_STREAKS = {"workout": 0, "diet": 0, "current_streak": 0, "longest_streak": 0}
+
+def _streak_kernel(entries: Sequence, today) -> Tuple[int, int, int]:
+    """
+    Single pass over newest-first (date, is_exercise_day, is_exercise_completed,
+    is_diet_completed) rows. Returns (workout current, workout longest,
+    diet current): the leading runs of completed days, and the longest
+    workout run anywhere in the sequence.
+    """
+    w_current = w_longest = run = d_current = 0
+    w_leading = d_leading = True
+    for i, (day, is_ex_day, ex_done, diet_done) in enumerate(entries):
+        # Special handling for "Today":
+        # If Today is DONE -> Streak includes today.
+        # If Today is NOT DONE -> Streak is whatever it was yesterday (doesn't reset to 0 unless yesterday was missed).
+        pending_today = i == 0 and day == today
+        if (not is_ex_day) or ex_done:
+            run += 1
+            if run > w_longest:
+                w_longest = run
+        elif not pending_today:
+            if w_leading:
+                w_current = run
+                w_leading = False
+            run = 0
+        if d_leading:
+            if diet_done:
+                d_current += 1
+            elif not pending_today:
+                d_leading = False
+    if w_leading:
+        w_current = run
+    return w_current, w_longest, d_current
+
+def calculate_streaks(user: User, plan: Optional[UserPlan] = None) -> Dict:
     """
     Calculate and update user streaks (Workout & Diet).
+    Pass the user's active plan as plan when the caller already has it.
+    Does not commit: changed values are left in the session for the caller.
     Rules:
     - Workout Streak: Consecutive days of exercise. Rest days count if not missed.
       If missed, streak resets.
     - Diet Streak: Consecutive days of diet completion.
     """
-    if not user: return {"workout": 0, "diet": 0}
+    if not user: return dict(_NO_STREAKS)
 
     # Find active or latest plan
-    plan = UserPlan.query.filter_by(user_id=user.id).order_by(UserPlan.created_at.desc()).first()
-    if not plan: return {"workout": 0, "diet": 0}
+    if plan is None:
+        plan = get_active_plan(user)
+    if not plan: return dict(_NO_STREAKS)
     
     today = datetime.utcnow().date()
     
     # Fetch entries up to yesterday (Streaks are usually built on past completetion)
     # But for "Current Streak" we include today if done.
     
-    entries = DailyPlanEntry.query.filter_by(plan_id=plan.id).filter(DailyPlanEntry.date <= today).order_by(DailyPlanEntry.date.desc()).all()
-    
-    # Calculate Workout Streak
-    w_streak = 0
-    # Sort entries by date desc (Today -> Past)
-    # Filter only relevant days (Exercise days or completed entries)
-    # Actually, streak rules: Consecutive days where (Exercise Done OR Rest Day).
-    # If today is NOT done yet, it shouldn't break streak from yesterday.
-    
-    # Check if today is in list
-    has_today = False
-    if entries and entries[0].date == today:
-        has_today = True
-        
-    start_index = 0
+    # Only the flags the rules read, as plain rows rather than ORM objects
+    entries = db.session.query(
+        DailyPlanEntry.date,
+        DailyPlanEntry.is_exercise_day,
+        DailyPlanEntry.is_exercise_completed,
+        DailyPlanEntry.is_diet_completed,
+    ).filter(
+        DailyPlanEntry.plan_id == plan.id, DailyPlanEntry.date <= today
+    ).order_by(DailyPlanEntry.date.desc()).limit(
+        # The plan's own length bounds both streaks
+        (plan.metadata_json or {}).get("total_days", 30) + 1
+    ).all()
     
-    # Special handling for "Today":
-    # If Today is DONE -> Streak includes today.
-    # If Today is NOT DONE -> Streak is whatever it was yesterday (doesn't reset to 0 unless yesterday was missed).
-    
-    if has_today:
-        e = entries[0]
-        today_success = (e.is_exercise_day and e.is_exercise_completed) or (not e.is_exercise_day)
-        if today_success:
-            w_streak = 1
-            start_index = 1
-        else:
-            # Today not done (or falied), so streak is based on yesterday.
-            # But if today is required and failed? (Usually exercise must be done).
-            # If not done yet, we ignore today for streak calculation and check yesterday.
-            start_index = 1
-            pass
-            
-            
-    # Iterate backwards
-    for i in range(start_index, len(entries)):
-        e = entries[i]
-        is_success = (e.is_exercise_day and e.is_exercise_completed) or (not e.is_exercise_day)
-        
-        # Check continuity (optional, but assumed contiguous for now)
-        # If we find a failure, STOP.
-        if is_success:
-            w_streak += 1
-        else:
-            break
+    # Streak rules: consecutive days where (Exercise Done OR Rest Day) for
+    # workouts, and consecutive completed days for diet; both in one pass.
+    w_streak, w_longest, d_streak = _streak_kernel(entries, today)
 
-    # Calculate Diet Streak (simpler: pure consecutive completed days)
-    d_streak = 0
-    d_start = 0
-    if has_today:
-        if entries[0].is_diet_completed:
-            d_streak = 1
-            d_start = 1
-        else:
-            d_start = 1 # Skip today if not done
-            
-    for i in range(d_start, len(entries)):
-        if entries[i].is_diet_completed:
-            d_streak += 1
-        else:
-            break
-            
-    # Update User Model
-    if w_streak != user.workout_streak or d_streak != user.diet_streak:
+    # Update User Model (and the plan's snapshot read by /api/plan/stats)
+    if (w_streak, d_streak) != (user.workout_streak, user.diet_streak) or \
+            (w_streak, w_longest) != (plan.current_streak, plan.longest_streak) or \
+            plan.streaks_refreshed_on != today:
         user.workout_streak = w_streak
         user.diet_streak = d_streak
-        db.session.commit()
+        plan.current_streak = w_streak
+        plan.longest_streak = w_longest
+        plan.streaks_refreshed_on = today
     
-    return {"workout": w_streak, "diet": d_streak}
+    return {
+        "workout": w_streak,
+        "diet": d_streak,
+        "current_streak": w_streak,
+        "longest_streak": w_longest,
+    }
+
+# Set-based version of _streak_kernel for every user's active plan, one row
+# per user: w_cur / d_cur are the runs after the latest break, w_longest the
+# longest run between breaks. A day missed before today breaks a streak;
+# today only counts once done. The plan is resolved like get_active_plan:
+# active_plan_id if that plan exists, else the user's latest plan.
+_ALL_STREAKS_CTE = """
+WITH active AS (
+    SELECT u.id AS user_id, COALESCE(
+        (SELECT p.id FROM user_plans p WHERE p.id = u.active_plan_id),
+        (SELECT p.id FROM user_plans p WHERE p.user_id = u.id
+            ORDER BY p.created_at DESC, p.id DESC LIMIT 1)
+    ) AS plan_id
+    FROM users u
+),
+marked AS (
+    SELECT e.plan_id, e.date,
+        (COALESCE(e.is_exercise_day, 0) = 0 OR COALESCE(e.is_exercise_completed, 0) != 0) AS w_ok,
+        (COALESCE(e.is_diet_completed, 0) != 0) AS d_ok
+    FROM daily_plan_entries e
+    JOIN active a ON a.plan_id = e.plan_id
+    WHERE e.date <= :today
+),
+grouped AS (
+    SELECT plan_id, w_ok, d_ok,
+        SUM(NOT w_ok AND date < :today) OVER w AS w_grp,
+        SUM(NOT d_ok AND date < :today) OVER w AS d_grp
+    FROM marked
+    WINDOW w AS (PARTITION BY plan_id ORDER BY date ROWS UNBOUNDED PRECEDING)
+),
+tails AS (
+    SELECT plan_id, MAX(w_grp) AS w_last, MAX(d_grp) AS d_last FROM grouped GROUP BY plan_id
+),
+runs AS (
+    SELECT plan_id, SUM(w_ok) AS len FROM grouped GROUP BY plan_id, w_grp
+),
+per_plan AS (
+    SELECT g.plan_id,
+        SUM(CASE WHEN g.w_grp = t.w_last THEN g.w_ok ELSE 0 END) AS w_cur,
+        SUM(CASE WHEN g.d_grp = t.d_last THEN g.d_ok ELSE 0 END) AS d_cur,
+        (SELECT MAX(len) FROM runs r WHERE r.plan_id = g.plan_id) AS w_longest
+    FROM grouped g JOIN tails t ON t.plan_id = g.plan_id
+    GROUP BY g.plan_id
+),
+s AS (
+    SELECT a.user_id, a.plan_id,
+        COALESCE(p.w_cur, 0) AS w_cur, COALESCE(p.d_cur, 0) AS d_cur,
+        COALESCE(p.w_longest, 0) AS w_longest
+    FROM active a LEFT JOIN per_plan p ON p.plan_id = a.plan_id
+    WHERE a.plan_id IS NOT NULL
+)
+"""
+
+def recompute_all_streaks() -> None:
+    """
+    Refresh stored streaks for every user with a plan in two
+    set-based UPDATEs (users, user_plans) instead of a query loop per user.
+    Same rules as calculate_streaks; commits.
+    """
+    params = {"today": datetime.utcnow().date().isoformat()}
+    db.session.execute(db.text(_ALL_STREAKS_CTE + """
+        UPDATE users SET workout_streak = s.w_cur, diet_streak = s.d_cur
+        FROM s WHERE users.id = s.user_id
+    """), params)
+    db.session.execute(db.text(_ALL_STREAKS_CTE + """
+        UPDATE user_plans SET current_streak = s.w_cur, longest_streak = s.w_longest,
+            streaks_refreshed_on = :today
+        FROM s WHERE user_plans.id = s.plan_id
+    """), params)
+    db.session.commit()
+
+def streaks_are_fresh(plan) -> bool:
+    """True if the plan's stored streaks were already recomputed today."""
+    return plan.streaks_refreshed_on == datetime.utcnow().date()
 
 def compute_streaks(user_id: int, plan_id: int) -> Dict:
-    """Wrapper for backward compatibility."""
-    user = User.query.get(user_id)
-    return calculate_streaks(user)
+    """Wrapper for backward compatibility. Does not commit either."""
+    # Both are usually already in the session's identity map
+    user = db.session.get(User, user_id)
+    plan = None
+    if user and plan_id == user.active_plan_id:
+        plan = db.session.get(UserPlan, plan_id)
+    return calculate_streaks(user, plan)
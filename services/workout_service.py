@@ -1,10 +1,165 @@
-from typing import Dict, List
+from dataclasses import asdict, dataclass
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
 import random
-from models import Exercise
+from models import Exercise, db
 
 # Workout Service
 
-def generate_exercises_list(goal: str, fitness_level: str, equipment: str) -> List[Dict]:
+class _ExerciseRow(NamedTuple):
+    """Plain, session-free copy of an Exercise plus precomputed match keys."""
+    id: int
+    name: str
+    muscle_group: Optional[str]
+    equipment: Optional[str]
+    difficulty: Optional[str]
+    description: Optional[str]
+    animation_url: Optional[str]
+    thumbnail_url: Optional[str]
+    tags: Optional[str]
+    tag_set: FrozenSet[str]
+    muscle_lower: str
+    is_bodyweight: bool
+
+class _ExerciseCatalog(NamedTuple):
+    """The library plus lookup buckets; *_bw variants hold bodyweight rows only."""
+    rows: Tuple[_ExerciseRow, ...]
+    by_tag: Dict[str, Tuple[_ExerciseRow, ...]]
+    by_tag_bw: Dict[str, Tuple[_ExerciseRow, ...]]
+    main: Tuple[_ExerciseRow, ...]
+    main_bw: Tuple[_ExerciseRow, ...]
+    muscle_keys: FrozenSet[str]
+    # (primary muscles, require_equip) -> (muscle groups, main rows); see _focus_pool
+    focus_pools: Dict[Tuple[Tuple[str, ...], bool], Tuple[FrozenSet[str], Tuple[_ExerciseRow, ...]]]
+
+_catalog: Optional[_ExerciseCatalog] = None
+
+def _build_catalog(rows: Tuple[_ExerciseRow, ...]) -> _ExerciseCatalog:
+    """Bucket rows by tag once so phase selection is a dict lookup."""
+    by_tag: Dict[str, List[_ExerciseRow]] = {}
+    for row in rows:
+        for tag in row.tag_set:
+            by_tag.setdefault(tag, []).append(row)
+    # Tag strings that are exactly one of these are excluded from the main phase
+    main = tuple(r for r in rows if r.tags is not None and r.tags not in ("warmup", "cooldown", "stretch"))
+    return _ExerciseCatalog(
+        rows=rows,
+        by_tag={t: tuple(b) for t, b in by_tag.items()},
+        by_tag_bw={t: tuple(r for r in b if r.is_bodyweight) for t, b in by_tag.items()},
+        main=main,
+        main_bw=tuple(r for r in main if r.is_bodyweight),
+        muscle_keys=frozenset(r.muscle_lower for r in rows),
+        focus_pools={},
+    )
+
+def _exercise_catalog() -> _ExerciseCatalog:
+    """
+    The exercise library, loaded once per process.
+    It only changes at seed time; an empty table is retried on the next call.
+    seed_data runs in its own process, so running workers keep the library
+    they loaded until they restart.
+    """
+    global _catalog
+    if not _catalog or not _catalog.rows:
+        rows = db.session.execute(db.select(
+            Exercise.id, Exercise.name, Exercise.muscle_group, Exercise.equipment,
+            Exercise.difficulty, Exercise.description, Exercise.animation_url,
+            Exercise.thumbnail_url, Exercise.tags,
+        ).order_by(Exercise.id))
+        _catalog = _build_catalog(tuple(
+            _ExerciseRow(
+                *row,
+                tag_set=frozenset(t.strip() for t in (row.tags or "").split(",") if t.strip()),
+                muscle_lower=(row.muscle_group or "").lower(),
+                is_bodyweight="bodyweight" in (row.equipment or "").lower(),
+            )
+            for row in rows
+        ))
+    return _catalog
+
+def clear_exercise_cache() -> None:
+    """
+    Drop the cached library after exercises are added or edited.
+    Only affects the calling process, not already-running web workers.
+    """
+    global _catalog
+    _catalog = None
+
+def _focus_pool(catalog: _ExerciseCatalog, primary_muscles: Tuple[str, ...], require_equip: bool):
+    """
+    Muscle groups matching a focus and the main exercises in them.
+    Fixed for a given catalog, so computed once per focus and kept on it.
+    """
+    key = (primary_muscles, require_equip)
+    pool = catalog.focus_pools.get(key)
+    if pool is None:
+        # Matching is substring, case-insensitive, against the few distinct
+        # groups rather than every row
+        primary_lower = tuple(m.lower() for m in primary_muscles)
+        muscle_match = frozenset(k for k in catalog.muscle_keys if any(m in k for m in primary_lower))
+        all_main = catalog.main if require_equip else catalog.main_bw
+        pool = catalog.focus_pools[key] = (
+            muscle_match,
+            tuple(e for e in all_main if e.muscle_lower in muscle_match),
+        )
+    return pool
+
+_DIFF_MAP = {"beginner": "Beginner", "intermediate": "Intermediate", "advanced": "Advanced"}
+
+# (goal substrings, primary muscle groups), first match wins
+_GOAL_PRIMARY_MUSCLES = (
+    (("lose", "fat_loss"), ("Full Body", "Legs", "Chest", "Back")),
+    (("gain", "muscle_gain"), ("Chest", "Back", "Legs", "Shoulders", "Arms")),
+    (("recomp", "core"), ("Full Body", "Abs", "Back")),
+)
+_DEFAULT_PRIMARY_MUSCLES = ("Full Body",)
+
+_DEFAULT_ANIMATION_URL = "https://assets.lottiefiles.com/packages/lf20_9xRkZk.json"
+_DEFAULT_THUMBNAIL_URL = "https://placehold.co/100x100?text=Ex"
+
+# (sets, reps) per phase; Main Workout depends on the exercise, see _format_one
+_PHASE_DEFAULTS = {
+    "Warm-up": (1, "60 sec"),
+    "Finisher": (2, "Failure"),
+    "Cool-down": (1, "60 sec hold"),
+}
+
+@dataclass(slots=True)
+class ExerciseCard:
+    """One exercise of a generated routine. orjson serializes it as an object."""
+    name: str
+    phase: str
+    sets: int
+    reps: str
+    muscle_group: Optional[str]
+    equipment: Optional[str]
+    difficulty: Optional[str]
+    description: Optional[str]
+    animation_url: str
+    thumbnail_url: str
+    id: int
+
+def _format_one(phase: str, ex: _ExerciseRow) -> ExerciseCard:
+    """Routine card for one exercise with phase-appropriate sets/reps."""
+    # Smart Sets/Reps
+    if phase == "Main Workout":
+        sets, reps = (4, "8-10") if "strength" in ex.tags else (3, "12-15")
+    else:
+        sets, reps = _PHASE_DEFAULTS.get(phase, (3, "10-12"))
+    return ExerciseCard(
+        name=ex.name,
+        phase=phase,
+        sets=sets,
+        reps=reps,
+        muscle_group=ex.muscle_group,
+        equipment=ex.equipment,
+        difficulty=ex.difficulty,
+        description=ex.description,
+        animation_url=ex.animation_url or _DEFAULT_ANIMATION_URL,
+        thumbnail_url=ex.thumbnail_url or _DEFAULT_THUMBNAIL_URL,
+        id=ex.id
+    )
+
+def generate_exercises_list(goal: str, fitness_level: str, equipment: str) -> List[ExerciseCard]:
     """
     Generate a professional 10-15 exercise workout routine.
     Structure: Warm-up (2) -> Main (7-11) -> Finisher (1-2) -> Cool-down (1)
@@ -15,44 +170,32 @@ def generate_exercises_list(goal: str, fitness_level: str, equipment: str) -> Li
         goal = "general_fitness"
     
     # 1. Determine Difficulty & Targets
-    diff_map = {"beginner": "Beginner", "intermediate": "Intermediate", "advanced": "Advanced"}
-    target_difficulty = diff_map.get(fitness_level, "Beginner")
+    target_difficulty = _DIFF_MAP.get(fitness_level, "Beginner")
     
     # Target Muscles based on Goal
-    primary_muscles = []
-    # Map new simplified keys to logic
-    if "lose" in goal or "fat_loss" in goal: 
-        primary_muscles = ["Full Body", "Legs", "Chest", "Back"]
-    elif "gain" in goal or "muscle_gain" in goal: 
-        primary_muscles = ["Chest", "Back", "Legs", "Shoulders", "Arms"]
-    elif "recomp" in goal or "core" in goal: 
-        primary_muscles = ["Full Body", "Abs", "Back"]
-    else: 
-        primary_muscles = ["Full Body"] # Default
+    primary_muscles = next(
+        (muscles for keys, muscles in _GOAL_PRIMARY_MUSCLES if any(k in goal for k in keys)),
+        _DEFAULT_PRIMARY_MUSCLES,
+    )
     
     # Equipment Filter
     # If no_equipment, strictly bodyweight. If with_equipment, prefer equipment but allow bodyweight.
     require_equip = (equipment == "with_equipment")
     
+    catalog = _exercise_catalog()
+    muscle_match, focus_main = _focus_pool(catalog, primary_muscles, require_equip)
+    
     # Helper to fetch by tag/type
     def get_ex(tags, limit, allow_repeat=False, strict_muscle=False):
-        query = Exercise.query
-        
-        # Filter by equipment
-        if not require_equip:
-            query = query.filter(Exercise.equipment.ilike("%Bodyweight%"))
-            
-        # Filter by tags (partial match)
+        # Filter by equipment and tag
         if isinstance(tags, list):
-            pass 
+            candidates = catalog.rows if require_equip else [c for c in catalog.rows if c.is_bodyweight]
         else:
-             query = query.filter(Exercise.tags.ilike(f"%{tags}%"))
-             
-        candidates = query.all()
+            candidates = (catalog.by_tag if require_equip else catalog.by_tag_bw).get(tags, ())
         
         # Filter strictly by muscle if requested
         if strict_muscle and primary_muscles:
-             candidates = [c for c in candidates if any(m.lower() in (c.muscle_group or "").lower() for m in primary_muscles)]
+             candidates = [c for c in candidates if c.muscle_lower in muscle_match]
              
         if not candidates: return []
         
@@ -64,23 +207,18 @@ def generate_exercises_list(goal: str, fitness_level: str, equipment: str) -> Li
     # Mobility, Light Cardio
     warmups = get_ex("warmup", 2)
     if not warmups: # Fallback query
-        warmups = Exercise.query.filter(Exercise.tags.ilike("%mobility%")).limit(2).all()
+        warmups = list(catalog.by_tag.get("mobility", ())[:2])
     routine.extend([{"phase": "Warm-up", "data": w} for w in warmups])
 
     # PHASE 2: MAIN LIFT (7-11 Exercises)
     target_count = 10 if fitness_level == "beginner" else (12 if fitness_level == "intermediate" else 15)
     main_count = target_count - 4 # Reserve for other phases
     
-    # Query Main Exercises
-    main_query = Exercise.query.filter(Exercise.tags.notin_(["warmup", "cooldown", "stretch"]))
-    if not require_equip:
-         main_query = main_query.filter(Exercise.equipment.ilike("%Bodyweight%"))
-    
-    # Filter by difficulty approx
-    all_main = main_query.all()
+    # Main Exercises
+    all_main = catalog.main if require_equip else catalog.main_bw
     
     # Scoping to muscle groups
-    relevant_main = [e for e in all_main if any(m.lower() in (e.muscle_group or "").lower() for m in primary_muscles)]
+    relevant_main = focus_main
     if len(relevant_main) < main_count:
         relevant_main = all_main # Fallback to all if not enough specific ones
         
@@ -97,34 +235,7 @@ def generate_exercises_list(goal: str, fitness_level: str, equipment: str) -> Li
     routine.extend([{"phase": "Cool-down", "data": c} for c in cooldowns])
     
     # Format Result
-    formatted_routine = []
-    for item in routine:
-        ex = item["data"]
-        # Smart Sets/Reps
-        sets = 3
-        reps = "10-12"
-        if item["phase"] == "Warm-up": sets=1; reps="60 sec"
-        elif item["phase"] == "Main Workout": 
-            if "strength" in ex.tags: sets=4; reps="8-10"
-            else: sets=3; reps="12-15"
-        elif item["phase"] == "Finisher": sets=2; reps="Failure"
-        elif item["phase"] == "Cool-down": sets=1; reps="60 sec hold"
-        
-        formatted_routine.append({
-            "name": ex.name,
-            "phase": item["phase"],
-            "sets": sets,
-            "reps": reps,
-            "muscle_group": ex.muscle_group,
-            "equipment": ex.equipment,
-            "difficulty": ex.difficulty,
-            "description": ex.description,
-            "animation_url": ex.animation_url or "https://assets.lottiefiles.com/packages/lf20_9xRkZk.json",
-            "thumbnail_url": ex.thumbnail_url or "https://placehold.co/100x100?text=Ex",
-            "id": ex.id
-        })
-        
-    return formatted_routine
+    return [_format_one(item["phase"], item["data"]) for item in routine]
 
 
 def recommend_workout(goal: str, fitness_level: str, freq: int) -> Dict:
@@ -143,11 +254,11 @@ def recommend_workout(goal: str, fitness_level: str, freq: int) -> Dict:
         "calories_burn": len(exercises) * 20
     }
 
-def get_equipment_for_workout(exercises: List[Dict]) -> List[str]:
-    """Extract required equipment from a list of exercises."""
+def get_equipment_for_workout(exercises: List) -> List[str]:
+    """Extract required equipment from a list of exercises (cards or stored dicts)."""
     equipment = set()
     for ex in exercises:
-        eq = ex.get("equipment", "Bodyweight")
+        eq = ex.equipment if isinstance(ex, ExerciseCard) else ex.get("equipment", "Bodyweight")
         if eq and "Bodyweight" not in eq and "None" not in eq:
             # Clean up string "Dumbbells, Mat" -> ["Dumbbells", "Mat"]
             for item in eq.split(","):
@@ -155,6 +266,10 @@ def get_equipment_for_workout(exercises: List[Dict]) -> List[str]:
                 if clean: equipment.add(clean)
     return list(equipment)
 
+# Generation goal per rotation slot. We rotate the "goal" slightly to create
+# variety in daily focus; Pull runs as muscle_gain (back is muscle).
+_DAY_FOCUS = ("muscle_gain", "muscle_gain", "legs", "abs", "fat_loss")
+
 def recommend_workout_day(goal: str, fitness_level: str, day_index: int, is_break: bool) -> List[Dict]:
     """
     Recommend exercises for a specific day in the plan.
@@ -165,17 +280,12 @@ def recommend_workout_day(goal: str, fitness_level: str, day_index: int, is_brea
 
     # Simple rotation based on day index (0-based)
     # 0=Push, 1=Pull, 2=Legs, 3=Core, 4=Full Body
-    rotation = ["muscle_gain", "back", "legs", "abs", "fat_loss"]
-    day_type = rotation[day_index % len(rotation)]
+    daily_focus = _DAY_FOCUS[day_index % len(_DAY_FOCUS)]
     
     # Use the robust generation logic which handles phases and volume
     equipment_prio = "with_equipment" # Default to using equipment if available
     
-    # We rotate the "goal" parameter slightly to create variety in daily focus,
-    # but still respect the user's primary goal in the long run.
-    daily_focus = day_type
-    if "back" in day_type: daily_focus = "muscle_gain" # Back is muscle
-    
     exercises = generate_exercises_list(daily_focus, fitness_level, equipment_prio)
     
-    return exercises
+    # Stored in a JSON column, so hand back plain dicts
+    return [asdict(ex) for ex in exercises]
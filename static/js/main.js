@@ -251,9 +251,13 @@ async function fetchPlanCalendar() {
 
     try {
         const res = await fetch('/api/plan/calendar');
-        const entries = await res.json();
 
-        entries.forEach(e => {
+        // NDJSON: render each day as its line arrives
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        const renderLines = (lines) => lines.filter(l => l.trim()).forEach(l => {
+            const e = JSON.parse(l);
             const d = document.createElement('div');
             d.className = 'p-1 rounded text-xs flex items-center justify-center aspect-square';
             d.textContent = new Date(e.date).getDate();
@@ -265,6 +269,16 @@ async function fetchPlanCalendar() {
 
             grid.appendChild(d);
         });
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            renderLines(lines);
+        }
+        renderLines([buffer]);
     } catch (e) { }
 }
 
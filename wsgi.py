@@ -1,7 +1,9 @@
-"""WSGI entry point for GymSphere Flask application."""
-from app import create_app
+"""WSGI entry point for GymSphere Flask application.
 
-application = create_app()
+Serve with a preloaded master so workers share the imported app:
+    gunicorn --preload -w 4 wsgi:application
+"""
+from app import app as application
 
 if __name__ == "__main__":
     application.run()